@@ -6,8 +6,10 @@
 """
 import os
 import platform
+import stat
+from functools import cached_property
 from pathlib import Path
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -19,6 +21,14 @@ if _env_file.exists():
     load_dotenv(_env_file)
 
 
+def _is_dir(path: str) -> bool:
+    """ディレクトリとして存在するか（statは1回のみ）"""
+    try:
+        return stat.S_ISDIR(os.stat(path).st_mode)
+    except (OSError, ValueError):
+        return False
+
+
 class Settings(BaseSettings):
     """アプリケーション設定"""
 
@@ -40,9 +50,11 @@ class Settings(BaseSettings):
 
     # インデックスDB設定
     index_db_path: str = "data/file_index.db"
+    maintenance_interval_sec: int = 1800  # DBメンテナンス（WALの切り詰め等）の実行間隔（秒、0で無効）
 
     # スキャン設定
     scan_workers: int = 4  # 並列スキャンのワーカー数
+    scan_use_processes: bool = False  # 走査をプロセスプールで行う（CPUコアを並列に使う）
     debounce_ms: int = 500  # イベントデバウンス間隔（ミリ秒）
     batch_size: int = 1000  # バッチINSERTサイズ
 
@@ -53,6 +65,9 @@ class Settings(BaseSettings):
     default_count: int = 100
     max_count: int = 10000
 
+    # CORS許可オリジン（カンマ区切り、"*"で全許可）
+    cors_origins: str = "*"
+
     @property
     def default_watch_path(self) -> Path:
         """デフォルトの監視パスを取得（環境変数 FILE_INDEX_DEFAULT_PATH で上書き可能）"""
@@ -69,32 +84,40 @@ class Settings(BaseSettings):
             return Path.home() / "Documents"
         return Path.home() / "Documents"
 
-    @property
-    def watch_paths_list(self) -> List[Path]:
-        """監視対象パスのリストを取得"""
-        paths: List[Path] = []
+    @cached_property
+    def watch_paths_list(self) -> List[str]:
+        """監視対象パスのリストを取得（絶対パス文字列、初回アクセス時に一度だけ評価）"""
+        paths: List[str] = []
         if self.watch_paths:
             for p in self.watch_paths.split(","):
                 p = p.strip()
-                if p:
-                    path = Path(p)
-                    if path.exists() and path.is_dir():
-                        paths.append(path)
+                if p and _is_dir(p):
+                    paths.append(os.path.abspath(p))
         # パスが指定されていない場合はデフォルトを使用
         if not paths:
-            default = self.default_watch_path
-            if default.exists() and default.is_dir():
-                paths.append(default)
+            default = str(self.default_watch_path)
+            if _is_dir(default):
+                paths.append(os.path.abspath(default))
         return paths
 
-    @property
+    @cached_property
     def ignore_patterns_list(self) -> List[str]:
-        """除外パターンのリストを取得"""
+        """除外パターンのリストを取得（初回アクセス時に一度だけ評価）"""
         return [p.strip() for p in self.ignore_patterns.split(",") if p.strip()]
 
-    @property
+    @cached_property
+    def ignore_patterns_set(self) -> FrozenSet[str]:
+        """除外パターンの集合を取得（和集合でのマージ用）"""
+        return frozenset(self.ignore_patterns_list)
+
+    @cached_property
+    def cors_origins_list(self) -> List[str]:
+        """CORS許可オリジンのリストを取得"""
+        return [o.strip() for o in self.cors_origins.split(",") if o.strip()] or ["*"]
+
+    @cached_property
     def index_db_full_path(self) -> Path:
-        """インデックスDBのフルパスを取得"""
+        """インデックスDBのフルパスを取得（初回アクセス時に一度だけ評価）"""
         # backendディレクトリからの相対パス
         backend_dir = Path(__file__).parent.parent
         return backend_dir / self.index_db_path
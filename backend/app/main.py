@@ -5,116 +5,183 @@ Everything互換のファイルインデックス検索サービス
 ポート8080でEverythingと同じ形式のAPIを提供
 """
 import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 # trigger reload
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.services.index_service import IndexService
-from app.services.scanner import ParallelScanner
-from app.services.watcher import FileWatcher
 from app.routers import search, admin
+from app import state
+
+if TYPE_CHECKING:
+    # watchdogの読み込みは起動を遅くするため、実行時はstart_indexing内で遅延インポート
+    from app.services.watcher import FileWatcher
+
+T = TypeVar("T")
 
 # グローバル変数
 _index_service: Optional[IndexService] = None
-_file_watcher: Optional[FileWatcher] = None
+_file_watcher: Optional["FileWatcher"] = None
 
+# 起動時の同期的なSQLite処理を実行する専用スレッド（lifespanごとに生成・停止する）
+_db_executor: Optional[ThreadPoolExecutor] = None
 
-async def start_indexing() -> None:
-    """インデックス構築を開始"""
-    global _index_service, _file_watcher
 
-    # IndexServiceの初期化
-    _index_service = IndexService(settings.index_db_full_path)
-    _index_service.init_db()
-    _index_service.ensure_trigram_index_populated()
-    _index_service.ensure_bigram_index_populated()
-    
+def _init_index_service() -> IndexService:
+    """共有IndexServiceの取得・DB初期化と設定値の登録（DBスレッドで実行）"""
+    # ルーターと同じ共有インスタンスを使う（未生成ならここでinit_db込みで生成される）
+    index_service = state.get_index_service()
+    index_service.ensure_trigram_index_populated()
+    index_service.ensure_bigram_index_populated()
+
     # Configの除外パターンをDBに登録
     for pattern in settings.ignore_patterns_list:
-        _index_service.add_ignore_pattern(pattern)
-
-    # admin.pyのグローバル変数も更新
-    admin._index_service = _index_service
+        index_service.add_ignore_pattern(pattern)
 
     # 監視パスの登録
-    watch_paths = settings.watch_paths_list
-    for path in watch_paths:
-        _index_service.register_path(str(path))
+    for path in settings.watch_paths_list:
+        index_service.register_path(path)
+
+    return index_service
+
+
+def _reset_path(index_service: IndexService, path: str) -> None:
+    """既存データを削除して再登録（1トランザクションで実行）"""
+    with index_service.transaction():
+        index_service.update_path_status(path, "scanning")
+        index_service.remove_path(path)
+        index_service.register_path(path)
+        index_service.update_path_status(path, "scanning")
+
+
+def _finish_path(index_service: IndexService, path: str, count: int) -> None:
+    """スキャン完了後の統計・ステータス更新"""
+    index_service.update_path_stats(path, total_files=count, indexed_files=count)
+    index_service.update_path_status(path, "watching")
+
+
+async def _run_db(func: Callable[..., T], *args: Any) -> T:
+    """同期的なDB処理を専用スレッドで実行"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args))
+
+
+async def start_indexing() -> None:
+    """インデックス構築を開始"""
+    global _index_service, _file_watcher
+
+    # スキャナー・ウォッチャーは必要になった時点で読み込む
+    from app.services.scanner import ParallelScanner
+    from app.services.watcher import FileWatcher
+
+    # IndexServiceの初期化（イベントループをブロックしないようDBスレッドで実行）
+    index_service = await _run_db(_init_index_service)
+    _index_service = index_service
 
     # バックグラウンドでスキャン
-    paths = _index_service.get_watch_paths()
-
-    for path_info in paths:
-        path = path_info["path"]
-        status = path_info["status"]
-
-        # idle状態のパスをスキャン
-        if status == "idle":
-            _index_service.update_path_status(path, "scanning")
-
-            # 既存データを削除して再登録
-            _index_service.remove_path(path)
-            _index_service.register_path(path)
-            _index_service.update_path_status(path, "scanning")
-            
-            # パターン取得 (DB + Config)
-            # 既にDBに入れたのでDBから取得すればOKだが、念のため両方見ておく
-            db_patterns = _index_service.get_ignore_patterns()
-            patterns = list(set(db_patterns + settings.ignore_patterns_list))
-
-            # スキャン実行
-            scanner = ParallelScanner(
-                max_workers=settings.scan_workers,
-                ignore_patterns=patterns,
-                batch_size=settings.batch_size,
-            )
-
-            try:
-                count = await scanner.scan_with_index_service(
-                    Path(path),
-                    _index_service,
+    paths = await _run_db(index_service.get_watch_paths)
+
+    # idle状態のパスをスキャン
+    idle_paths = [p["path"] for p in paths if p["status"] == "idle"]
+
+    if idle_paths:
+        # 初回スキャン中はFTS5トリガーを止め、終了時に一括で索引を作る
+        await _run_db(index_service.begin_bulk_ingest)
+        try:
+            for path in idle_paths:
+                await _run_db(_reset_path, index_service, path)
+
+                # パターン取得 (DB + Config)
+                # 既にDBに入れたのでDBから取得すればOKだが、念のため両方見ておく
+                db_patterns = await _run_db(index_service.get_ignore_patterns_set)
+                patterns = db_patterns | settings.ignore_patterns_set
+
+                # スキャン実行
+                scanner = ParallelScanner(
+                    max_workers=settings.scan_workers,
+                    ignore_patterns=patterns,
+                    batch_size=settings.batch_size,
+                    use_processes=settings.scan_use_processes,
                 )
-                _index_service.update_path_stats(path, total_files=count, indexed_files=count)
-                _index_service.update_path_status(path, "watching")
-            except Exception as e:
-                _index_service.update_path_status(path, "error")
-                print(f"Error scanning {path}: {e}")
 
-    # インデックス再構築（別スレッドで実行）
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, _index_service.rebuild_trigram_index)
-    await loop.run_in_executor(None, _index_service.rebuild_bigram_index)
+                try:
+                    count = await asyncio.to_thread(
+                        scanner.scan_with_index_service,
+                        Path(path),
+                        index_service,
+                    )
+                    await _run_db(_finish_path, index_service, path, count)
+                except Exception as e:
+                    await _run_db(index_service.set_path_error, path, str(e)[:500])
+                    print(f"Error scanning {path}: {e}")
+        finally:
+            # FTS5（trigram含む）の索引はここで再構築される
+            await _run_db(index_service.end_bulk_ingest)
+
+    # 全パスのスキャン後にbigramインデックスを一度だけ再構築（別スレッドで実行）
+    await asyncio.to_thread(index_service.rebuild_bigram_index)
 
     # ファイル監視を開始
-    watch_path_strings = [p["path"] for p in _index_service.get_watch_paths()]
+    watch_paths = await _run_db(index_service.get_watch_paths)
+    watch_path_strings = [p["path"] for p in watch_paths]
     if watch_path_strings:
         _file_watcher = FileWatcher(
-            _index_service,
+            index_service,
             debounce_ms=settings.debounce_ms,
             ignore_patterns=settings.ignore_patterns_list,
         )
         _file_watcher.start(watch_path_strings)
 
 
+async def run_maintenance() -> None:
+    """DBメンテナンスを一定間隔で実行（別スレッドで実行）"""
+    while True:
+        await asyncio.sleep(settings.maintenance_interval_sec)
+        if _index_service is None:
+            continue
+        try:
+            await asyncio.to_thread(_index_service.maintenance)
+        except Exception as e:
+            print(f"Error during index maintenance: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """アプリケーションのライフサイクル管理"""
+    global _db_executor, _file_watcher, _index_service
+
     # 起動時
-    asyncio.create_task(start_indexing())
+    _db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-db")
+    indexing_task = asyncio.create_task(start_indexing())
+    maintenance_task = None
+    if settings.maintenance_interval_sec > 0:
+        maintenance_task = asyncio.create_task(run_maintenance())
 
     yield
 
-    # 終了時
-    global _file_watcher, _index_service
+    # 終了時（共有インスタンスを閉じる前に起動処理を止める）
+    indexing_task.cancel()
+    if maintenance_task is not None:
+        maintenance_task.cancel()
+    await asyncio.gather(indexing_task, return_exceptions=True)
     if _file_watcher is not None:
         _file_watcher.stop()
-    if _index_service is not None:
-        _index_service.close()
+        _file_watcher = None
+    # 起動処理の完了前にリクエストが生成したインスタンスも含め、共有インスタンスを閉じる
+    _index_service = None
+    index_service = state.pop_index_service()
+    if index_service is not None:
+        index_service.close()
+    _db_executor.shutdown(wait=False)
+    _db_executor = None
 
 
 # FastAPIアプリケーション
@@ -126,10 +193,11 @@ app = FastAPI(
 )
 
 # CORS設定
+# ワイルドカード指定時は資格情報付きリクエストを許可しない（仕様上も併用不可）
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=settings.cors_origins_list,
+    allow_credentials="*" not in settings.cors_origins_list,
     allow_methods=["*"],
     allow_headers=["*"],
 )
@@ -138,14 +206,13 @@ app.add_middleware(
 app.include_router(search.router)
 app.include_router(admin.router, prefix="", tags=["admin"])
 
-import os
-from fastapi.staticfiles import StaticFiles
-
 # 静的ファイルのパス
 STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
 
 # 静的ファイルが存在する場合のみマウント
 if os.path.exists(STATIC_DIR):
+    from fastapi.staticfiles import StaticFiles
+
     app.mount("/assets", StaticFiles(directory=os.path.join(STATIC_DIR, "assets")), name="assets")
 
 
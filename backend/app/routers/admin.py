@@ -13,22 +13,12 @@ from pydantic import BaseModel
 
 from app.config import settings
 from app.services.index_service import IndexService
-from app.services.scanner import ParallelScanner
+from app.state import get_index_service
 
 router = APIRouter()
 
-# グローバルなIndexServiceインスタンス
-_index_service: Optional[IndexService] = None
-
-
-def get_index_service() -> IndexService:
-    """IndexServiceインスタンスを取得"""
-    # ensure changes are picked up
-    global _index_service
-    if _index_service is None:
-        _index_service = IndexService(settings.index_db_full_path)
-        _index_service.init_db()
-    return _index_service
+# 実行待ち・実行中のスキャンタスク数（0になった時点で検索インデックスを一度だけ再構築）
+_pending_scans = 0
 
 
 class PathRequest(BaseModel):
@@ -133,6 +123,7 @@ async def add_path(request: PathRequest, background_tasks: BackgroundTasks):
     index_service.update_path_status(path, "scanning")
 
     # バックグラウンドでスキャン開始
+    _begin_scan()
     background_tasks.add_task(_scan_path, path)
 
     return {"path": path, "status": "scanning"}
@@ -259,6 +250,7 @@ async def rebuild_index(
     # バックグラウンドで再構築開始
     for p in target_paths:
         index_service.update_path_status(p["path"], "scanning")
+        _begin_scan()
         background_tasks.add_task(_rebuild_path, p["path"], ignore_patterns)
 
     return {
@@ -267,22 +259,48 @@ async def rebuild_index(
     }
 
 
+async def rebuild_search_indexes(index_service: IndexService) -> None:
+    """trigram/bigramインデックスを別スレッドで再構築（両方を同時に投入）"""
+    await asyncio.gather(
+        asyncio.to_thread(index_service.rebuild_trigram_index),
+        asyncio.to_thread(index_service.rebuild_bigram_index),
+    )
+
+
+def _begin_scan() -> None:
+    """スキャンタスクの投入を記録"""
+    global _pending_scans
+    _pending_scans += 1
+
+
+async def _end_scan(index_service: IndexService) -> None:
+    """スキャンタスクの完了を記録し、最後の1件であればインデックスを再構築"""
+    global _pending_scans
+    _pending_scans = max(_pending_scans - 1, 0)
+    if _pending_scans == 0:
+        await rebuild_search_indexes(index_service)
+
+
 async def _scan_path(path: str) -> None:
     """パスをスキャン（バックグラウンドタスク）"""
+    # スキャナーは起動時に読み込まず、スキャン実行時に読み込む
+    from app.services.scanner import ParallelScanner
+
     index_service = get_index_service()
 
     try:
         # DBからパターンを取得し、設定とマージ
-        db_patterns = index_service.get_ignore_patterns()
-        patterns = list(set(settings.ignore_patterns_list + db_patterns))
+        patterns = settings.ignore_patterns_set | index_service.get_ignore_patterns_set()
 
         scanner = ParallelScanner(
             max_workers=settings.scan_workers,
             ignore_patterns=patterns,
             batch_size=settings.batch_size,
+            use_processes=settings.scan_use_processes,
         )
 
-        count = await scanner.scan_with_index_service(
+        count = await asyncio.to_thread(
+            scanner.scan_with_index_service,
             Path(path),
             index_service,
         )
@@ -291,55 +309,41 @@ async def _scan_path(path: str) -> None:
         index_service.update_path_stats(path, total_files=count, indexed_files=count)
         index_service.update_path_status(path, "watching")
 
-        # インデックス再構築
-        await asyncio.get_event_loop().run_in_executor(
-            None, index_service.rebuild_trigram_index
-        )
-        await asyncio.get_event_loop().run_in_executor(
-            None, index_service.rebuild_bigram_index
-        )
-
     except Exception as e:
-        index_service.update_path_status(path, "error")
-        # エラーメッセージを保存（簡略化）
-        conn = index_service._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE watch_paths SET error_message = ? WHERE path = ?",
-            (str(e)[:500], path),
-        )
-        conn.commit()
+        index_service.set_path_error(path, str(e)[:500])
+
+    finally:
+        await _end_scan(index_service)
 
 
 async def _rebuild_path(path: str, ignore_patterns: Optional[str] = None) -> None:
     """パスを再構築（バックグラウンドタスク）"""
+    # スキャナーは起動時に読み込まず、スキャン実行時に読み込む
+    from app.services.scanner import ParallelScanner
+
     index_service = get_index_service()
 
     try:
-        # 既存データを削除
-        index_service.remove_path(path)
-        index_service.register_path(path)
-        index_service.update_path_status(path, "scanning")
+        # 既存データを削除して再登録（1トランザクションで実行）
+        with index_service.transaction():
+            index_service.remove_path(path)
+            index_service.register_path(path)
+            index_service.update_path_status(path, "scanning")
 
         # 除外パターン（DB + Config + 引数）
-        db_patterns = index_service.get_ignore_patterns()
-        config_patterns = settings.ignore_patterns_list
-        patterns = list(set(db_patterns + config_patterns))
-        
+        patterns = settings.ignore_patterns_set | index_service.get_ignore_patterns_set()
         if ignore_patterns:
-            arg_patterns = [p.strip() for p in ignore_patterns.split(",") if p.strip()]
-            patterns.extend(arg_patterns)
-        
-        # 重複排除
-        patterns = list(set(patterns))
+            patterns |= {p.strip() for p in ignore_patterns.split(",") if p.strip()}
 
         scanner = ParallelScanner(
             max_workers=settings.scan_workers,
             ignore_patterns=patterns,
             batch_size=settings.batch_size,
+            use_processes=settings.scan_use_processes,
         )
 
-        count = await scanner.scan_with_index_service(
+        count = await asyncio.to_thread(
+            scanner.scan_with_index_service,
             Path(path),
             index_service,
         )
@@ -348,20 +352,8 @@ async def _rebuild_path(path: str, ignore_patterns: Optional[str] = None) -> Non
         index_service.update_path_stats(path, total_files=count, indexed_files=count)
         index_service.update_path_status(path, "watching")
 
-        # インデックス再構築
-        await asyncio.get_event_loop().run_in_executor(
-            None, index_service.rebuild_trigram_index
-        )
-        await asyncio.get_event_loop().run_in_executor(
-            None, index_service.rebuild_bigram_index
-        )
-
     except Exception as e:
-        index_service.update_path_status(path, "error")
-        conn = index_service._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE watch_paths SET error_message = ? WHERE path = ?",
-            (str(e)[:500], path),
-        )
-        conn.commit()
+        index_service.set_path_error(path, str(e)[:500])
+
+    finally:
+        await _end_scan(index_service)
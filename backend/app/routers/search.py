@@ -3,154 +3,57 @@ Everything互換検索API
 - GET / でEverythingと同じ形式の検索を提供
 - JSON形式のレスポンス対応
 """
-from typing import Optional
+import functools
+import html as html_lib
+from string import Template
+from typing import Annotated, Optional, Tuple
 
+import orjson
 from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, Response
+from pydantic import BaseModel, Field
 
 from app.config import settings
-from app.services.index_service import IndexService
+from app.state import get_index_service
 
 router = APIRouter()
 
-
-def get_index_service() -> IndexService:
-    """IndexServiceインスタンスを取得"""
-    service = IndexService(settings.index_db_full_path)
-    return service
-
-
-@router.get("/")
-async def search(
-    # Everything互換パラメータ
-    search: Optional[str] = Query(None, alias="search", description="検索クエリ"),
-    s: Optional[str] = Query(None, description="検索クエリ（エイリアス）"),
-    q: Optional[str] = Query(None, description="検索クエリ（エイリアス）"),
-    json: int = Query(0, alias="json", description="JSON形式で返す（1=有効）"),
-    j: int = Query(0, description="JSON形式（エイリアス）"),
-    offset: int = Query(0, alias="offset", ge=0, description="結果オフセット"),
-    o: int = Query(0, ge=0, description="オフセット（エイリアス）"),
-    count: int = Query(100, alias="count", ge=1, description="最大結果数"),
-    c: int = Query(0, ge=0, description="結果数（エイリアス）"),
-    sort: str = Query("name", description="ソート順（name, path, size, date_modified）"),
-    ascending: int = Query(1, description="昇順(1)/降順(0)"),
-    path_column: int = Query(1, description="パス列を含める"),
-    size_column: int = Query(1, description="サイズ列を含める"),
-    date_modified_column: int = Query(1, description="更新日列を含める"),
-    # 拡張パラメータ
-    path: Optional[str] = Query(None, description="検索対象パス（拡張）"),
-    regex: int = Query(0, alias="regex", description="正規表現検索"),
-    r: int = Query(0, description="正規表現（エイリアス）"),
-    case: int = Query(0, alias="case", description="大文字小文字区別"),
-    i: int = Query(0, description="大文字小文字（エイリアス）"),
-    file_type: str = Query("all", description="ファイルタイプ（all/file/directory）"),
-    depth: int = Query(0, description="階層深度 (0=無制限)"),
-):
-    """
-    Everything互換検索API
-
-    EverythingのHTTP Serverと同じパラメータをサポート。
-    json=1 でJSON形式、それ以外はHTML形式で返す。
-    """
-    # エイリアスの解決
-    query = search or s or q or ""
-    use_json = json == 1 or j == 1
-    result_offset = offset if offset > 0 else o
-    result_count = count if c == 0 else c
-    if result_count == 0:
-        result_count = settings.default_count
-    result_count = min(result_count, settings.max_count)
-
-    result_count = min(result_count, settings.max_count)
-
-    # ソート順の正規化
-    sort_mapping = {
-        "date_modified": "mtime",
-        "size": "size",
-        "path": "path",
-        "name": "name",
-    }
-    sort_column = sort_mapping.get(sort, "name")
-
-    # 検索実行
-    index_service = get_index_service()
-
-    try:
-        results = index_service.search(
-            query=query,
-            path_filter=path,
-            type_filter=file_type if file_type != "all" else None,
-            max_results=result_count,
-            offset=result_offset,
-            sort=sort_column,
-            ascending=ascending == 1,
-            depth=depth,
-        )
-    finally:
-        index_service.close()
-
-    # レスポンス構築
-    if use_json:
-        # JSON形式
-        response_results = []
-        for item in results:
-            result_item = {"name": item["name"]}
-            if path_column:
-                result_item["path"] = item["path"]
-            result_item["type"] = item["type"]
-            if size_column:
-                result_item["size"] = item.get("size", 0)
-            if date_modified_column:
-                result_item["date_modified"] = item.get("mtime", 0)
-
-            response_results.append(result_item)
-
-        return JSONResponse(
-            content={
-                "totalResults": len(results),
-                "results": response_results,
-            }
-        )
-    else:
-        # JSON以外の場合
-        # 1. 静的ファイルとしてビルドされたReactアプリ(index.html)があればそれを返す
-        # 2. なければ従来の簡易HTMLを返す
-        import os
-        from fastapi.responses import FileResponse
-        
-        static_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "static")
-        index_html = os.path.join(static_dir, "index.html")
-        
-        if os.path.exists(index_html):
-            return FileResponse(index_html)
-
-        # HTML形式（シンプルなテーブル - 従来のフォールバック）
-        html = """
+# Everything互換のソート名 → DBカラム名
+_SORT_MAPPING = {
+    "date_modified": "mtime",
+    "size": "size",
+    "path": "path",
+    "name": "name",
+}
+
+# HTMLフォールバック用テンプレート（モジュール読み込み時に一度だけ構築）
+# 行とフッターはUTF-8のbytesで保持し、レスポンス全体を再エンコードせずに組み立てる
+_HTML_HEAD = Template("""
 <!DOCTYPE html>
 <html>
 <head>
     <meta charset="utf-8">
     <title>File Index Service - Search Results</title>
     <style>
-        body {{ font-family: sans-serif; margin: 20px; }}
-        table {{ border-collapse: collapse; width: 100%; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-        th {{ background-color: #4CAF50; color: white; }}
-        tr:nth-child(even) {{ background-color: #f2f2f2; }}
-        .search-form {{ margin-bottom: 20px; }}
-        input[type=text] {{ padding: 8px; width: 300px; }}
-        button {{ padding: 8px 16px; }}
+        body { font-family: sans-serif; margin: 20px; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        th { background-color: #4CAF50; color: white; }
+        tr:nth-child(even) { background-color: #f2f2f2; }
+        .search-form { margin-bottom: 20px; }
+        input[type=text] { padding: 8px; width: 300px; }
+        button { padding: 8px 16px; }
     </style>
 </head>
 <body>
     <h1>File Index Service</h1>
     <div class="search-form">
         <form method="get" action="/">
-            <input type="text" name="search" value="{query}" placeholder="検索...">
+            <input type="text" name="search" value="$query" placeholder="検索...">
             <button type="submit">検索</button>
         </form>
     </div>
-    <p>検索結果: {count}件</p>
+    <p>検索結果: $count件</p>
     <table>
         <tr>
             <th>名前</th>
@@ -158,27 +61,177 @@ async def search(
             <th>タイプ</th>
             <th>サイズ</th>
         </tr>
-        {rows}
+        """)
+
+_HTML_TAIL = b"""
     </table>
 </body>
 </html>
 """
-        rows = ""
-        for item in results:
-            size_str = f"{item.get('size', 0):,}" if item["type"] == "file" else "-"
-            rows += f"""
+
+_HTML_ROW = b"""
         <tr>
-            <td>{item['name']}</td>
-            <td>{item['path']}</td>
-            <td>{item['type']}</td>
-            <td>{size_str}</td>
+            <td>%s</td>
+            <td>%s</td>
+            <td>%s</td>
+            <td>%s</td>
         </tr>
 """
 
-        html = html.format(
-            query=query,
-            count=len(results),
-            rows=rows,
+
+@functools.lru_cache(maxsize=None)
+def _result_columns(
+    path_column: bool, size_column: bool, date_modified_column: bool
+) -> Tuple[Tuple[str, str], ...]:
+    """JSON出力列（出力キー, 検索結果のキー）の組を列フラグの組み合わせごとに構築"""
+    columns = [("name", "name")]
+    if path_column:
+        columns.append(("path", "path"))
+    columns.append(("type", "type"))
+    if size_column:
+        columns.append(("size", "size"))
+    if date_modified_column:
+        columns.append(("date_modified", "mtime"))
+    return tuple(columns)
+
+
+class EverythingParams(BaseModel):
+    """
+    Everything互換の検索パラメータ
+
+    エイリアス（search/s/q, json/j など）はモデル側で解決し、
+    エンドポイントは解決済みの値だけを参照する。
+    """
+
+    # Everything互換パラメータ
+    search: Optional[str] = Field(None, description="検索クエリ")
+    s: Optional[str] = Field(None, description="検索クエリ（エイリアス）")
+    q: Optional[str] = Field(None, description="検索クエリ（エイリアス）")
+    json_: int = Field(0, alias="json", description="JSON形式で返す（1=有効）")
+    j: int = Field(0, description="JSON形式（エイリアス）")
+    offset: int = Field(0, ge=0, description="結果オフセット")
+    o: int = Field(0, ge=0, description="オフセット（エイリアス）")
+    count: int = Field(100, ge=1, description="最大結果数")
+    c: int = Field(0, ge=0, description="結果数（エイリアス）")
+    sort: str = Field("name", description="ソート順（name, path, size, date_modified）")
+    ascending: int = Field(1, description="昇順(1)/降順(0)")
+    path_column: int = Field(1, description="パス列を含める")
+    size_column: int = Field(1, description="サイズ列を含める")
+    date_modified_column: int = Field(1, description="更新日列を含める")
+    # 拡張パラメータ
+    path: Optional[str] = Field(None, description="検索対象パス（拡張）")
+    regex: int = Field(0, description="正規表現検索")
+    r: int = Field(0, description="正規表現（エイリアス）")
+    case: int = Field(0, description="大文字小文字区別")
+    i: int = Field(0, description="大文字小文字（エイリアス）")
+    file_type: str = Field("all", description="ファイルタイプ（all/file/directory）")
+    depth: int = Field(0, description="階層深度 (0=無制限)")
+
+    @property
+    def query(self) -> str:
+        """検索クエリ（search > s > q の順で採用）"""
+        return self.search or self.s or self.q or ""
+
+    @property
+    def use_json(self) -> bool:
+        """JSON形式で返すか"""
+        return self.json_ == 1 or self.j == 1
+
+    @property
+    def result_offset(self) -> int:
+        """結果オフセット"""
+        return self.offset if self.offset > 0 else self.o
+
+    @property
+    def result_count(self) -> int:
+        """最大結果数（max_countで上限を適用）"""
+        return min((self.c or self.count) or settings.default_count, settings.max_count)
+
+    @property
+    def sort_column(self) -> str:
+        """ソートに使うDBカラム名"""
+        return _SORT_MAPPING.get(self.sort, "name")
+
+    @property
+    def type_filter(self) -> Optional[str]:
+        """タイプフィルタ（allの場合はNone）"""
+        return self.file_type if self.file_type != "all" else None
+
+
+@router.get("/")
+async def search(params: Annotated[EverythingParams, Query()]):
+    """
+    Everything互換検索API
+
+    EverythingのHTTP Serverと同じパラメータをサポート。
+    json=1 でJSON形式、それ以外はHTML形式で返す。
+    """
+    query = params.query
+
+    # 検索実行（共有インスタンスの永続接続を再利用）
+    index_service = get_index_service()
+    results = index_service.search(
+        query=query,
+        path_filter=params.path,
+        type_filter=params.type_filter,
+        max_results=params.result_count,
+        offset=params.result_offset,
+        sort=params.sort_column,
+        ascending=params.ascending == 1,
+        depth=params.depth,
+    )
+
+    # レスポンス構築
+    if params.use_json:
+        # JSON形式
+        # 列構成はリクエスト単位で固定なので、行ループの外で一度だけ決定する
+        columns = _result_columns(
+            bool(params.path_column),
+            bool(params.size_column),
+            bool(params.date_modified_column),
+        )
+        response_results = [{key: item[src] for key, src in columns} for item in results]
+
+        # orjsonでbytesへ直接シリアライズ（中間のstrを生成しない）
+        return Response(
+            content=orjson.dumps(
+                {
+                    "totalResults": len(results),
+                    "results": response_results,
+                }
+            ),
+            media_type="application/json",
+        )
+    else:
+        # JSON以外の場合
+        # 1. 静的ファイルとしてビルドされたReactアプリ(index.html)があればそれを返す
+        # 2. なければ従来の簡易HTMLを返す
+        import os
+        from fastapi.responses import FileResponse
+        
+        static_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "static")
+        index_html = os.path.join(static_dir, "index.html")
+        
+        if os.path.exists(index_html):
+            return FileResponse(index_html)
+
+        # HTML形式（シンプルなテーブル - 従来のフォールバック）
+        head = _HTML_HEAD.substitute(query=html_lib.escape(query), count=len(results))
+        body = b"".join(
+            [
+                head.encode("utf-8"),
+                *(
+                    _HTML_ROW
+                    % (
+                        html_lib.escape(item["name"]).encode("utf-8"),
+                        html_lib.escape(item["path"]).encode("utf-8"),
+                        item["type"].encode("utf-8"),
+                        (f"{item.get('size', 0):,}" if item["type"] == "file" else "-").encode("utf-8"),
+                    )
+                    for item in results
+                ),
+                _HTML_TAIL,
+            ]
         )
 
-        return HTMLResponse(content=html)
+        return HTMLResponse(content=body, media_type="text/html; charset=utf-8")
@@ -4,14 +4,220 @@
 - ファイルメタデータの管理
 - 監視パスの管理
 """
+import functools
+import itertools
+import os
+import queue
+import re
 import sqlite3
 import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
 import fnmatch
 import threading
 
 
+# 接続ごとに適用するPRAGMA（サーバー用途向けの設定）
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",  # 64MB
+    "PRAGMA mmap_size = 268435456",  # 256MB
+    "PRAGMA busy_timeout = 30000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA wal_autocheckpoint = 1000",
+)
+
+# 読み取り専用接続に適用するPRAGMA（ジャーナル設定などDBファイルを変更するものは除く）
+_READER_PRAGMAS = (
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",  # 64MB
+    "PRAGMA mmap_size = 268435456",  # 256MB
+    "PRAGMA busy_timeout = 30000",
+)
+
+# プールに保持する読み取り専用接続の最大数（超過分は返却時に閉じる）
+_READER_POOL_SIZE = 8
+
+# file_metadataの二次インデックス（名前, DDL）。bulk_ingest()中は削除し、終了時に作り直す
+_SECONDARY_INDEXES = (
+    (
+        "idx_file_metadata_parent_path",
+        "CREATE INDEX IF NOT EXISTS idx_file_metadata_parent_path ON file_metadata(parent_path)",
+    ),
+    (
+        "idx_file_metadata_type",
+        "CREATE INDEX IF NOT EXISTS idx_file_metadata_type ON file_metadata(type)",
+    ),
+    # ファイル名にインデックスを作成（LIKE検索・名前順ソートの高速化）
+    # 末尾にrowid(id)を暗黙に含むため (name, id) の複合インデックスと同等
+    (
+        "idx_file_metadata_name",
+        "CREATE INDEX IF NOT EXISTS idx_file_metadata_name ON file_metadata(name)",
+    ),
+    # 更新日時順のソートをインデックス走査で済ませ、LIMIT件数で打ち切れるようにする
+    (
+        "idx_file_metadata_mtime",
+        "CREATE INDEX IF NOT EXISTS idx_file_metadata_mtime ON file_metadata(mtime)",
+    ),
+)
+
+# 削除済みの旧FTS5テーブル（file_index）の同期トリガー名
+_LEGACY_FTS_TRIGGERS = ("file_metadata_ai", "file_metadata_ad", "file_metadata_au")
+
+# trigramインデックス用のトリガー（名前, DDL）
+_TRIGRAM_TRIGGERS = (
+    (
+        "file_metadata_ai_trigram",
+        """
+        CREATE TRIGGER IF NOT EXISTS file_metadata_ai_trigram AFTER INSERT ON file_metadata BEGIN
+            INSERT INTO file_name_index(rowid, name)
+            VALUES (new.id, new.name);
+        END
+        """,
+    ),
+    (
+        "file_metadata_ad_trigram",
+        """
+        CREATE TRIGGER IF NOT EXISTS file_metadata_ad_trigram AFTER DELETE ON file_metadata BEGIN
+            INSERT INTO file_name_index(file_name_index, rowid, name)
+            VALUES ('delete', old.id, old.name);
+        END
+        """,
+    ),
+    (
+        "file_metadata_au_trigram",
+        """
+        CREATE TRIGGER IF NOT EXISTS file_metadata_au_trigram AFTER UPDATE ON file_metadata BEGIN
+            INSERT INTO file_name_index(file_name_index, rowid, name)
+            VALUES ('delete', old.id, old.name);
+            INSERT INTO file_name_index(rowid, name)
+            VALUES (new.id, new.name);
+        END
+        """,
+    ),
+)
+
+# コンパイル済みパターンのmatchメソッド
+_Matcher = Callable[[str], Optional["re.Match[str]"]]
+
+# 接続ごとに保持するプリペアドステートメント数（既定の128より多めに確保）
+_CACHED_STATEMENTS = 512
+
+# 書き込みスレッドが1トランザクションにまとめる最大件数
+_WRITE_BATCH_MAX = 1000
+
+
+@functools.lru_cache(maxsize=64)
+def _update_file_sql(columns: Tuple[str, ...]) -> str:
+    """update_file用のUPDATE文（カラムの組み合わせごとにキャッシュ）"""
+    set_clause = ", ".join(f"{column} = ?" for column in columns)
+    return f"UPDATE file_metadata SET {set_clause} WHERE path = ?"
+
+
+# パス区切り文字（正規表現の文字クラス用にエスケープ済み）
+_SEPARATORS = re.escape(os.sep + (os.altsep or ""))
+
+
+def _translate_name_glob(pattern: str) -> str:
+    """
+    globパターンを、パスの1要素の中だけにマッチする正規表現に変換
+
+    fnmatch.translate と同じ記法（*, ?, [...]）を扱うが、
+    * と ? は区切り文字をまたがない。
+    """
+    i, n = 0, len(pattern)
+    res = []
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            # 連続する * は1つにまとめる
+            if not res or res[-1] != f"[^{_SEPARATORS}]*":
+                res.append(f"[^{_SEPARATORS}]*")
+        elif c == "?":
+            res.append(f"[^{_SEPARATORS}]")
+        elif c == "[":
+            j = i
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                res.append("\\[")
+            else:
+                stuff = pattern[i:j].replace("\\", "\\\\")
+                i = j + 1
+                if stuff[0] == "!":
+                    rest = stuff[1:]
+                    # 区切り文字を前に置くため、先頭の ] はエスケープしないとクラスが閉じてしまう
+                    if rest[:1] == "]":
+                        rest = "\\]" + rest[1:]
+                    stuff = f"^{_SEPARATORS}" + rest
+                elif stuff[0] in "^[":
+                    stuff = "\\" + stuff
+                res.append(f"[{stuff}]")
+        else:
+            res.append(re.escape(c))
+    return "".join(res)
+
+
+# 検索のソートに使用できるカラム
+_SORT_COLUMNS = frozenset({"name", "path", "size", "mtime"})
+
+# 検索クエリの種類ごとのFROM/WHERE句（file_metadataは常にエイリアスmで参照する）
+_SEARCH_SOURCES = {
+    "all": "SELECT m.* FROM file_metadata m WHERE 1=1",
+    "fts": (
+        "SELECT m.* FROM file_metadata m"
+        " JOIN file_name_index fi ON m.id = fi.rowid"
+        " WHERE file_name_index MATCH ?"
+    ),
+    # (bigram, file_id)は一意のためDISTINCTは不要
+    "bigram": (
+        "SELECT m.* FROM file_metadata m"
+        " JOIN file_name_bigrams b ON m.id = b.file_id"
+        " WHERE b.bigram = ?"
+    ),
+    "like": "SELECT m.* FROM file_metadata m WHERE m.name LIKE ?",
+}
+
+# パスフィルタの条件（"depth"は基準パス自身と配下のうち区切り文字の数で階層を絞る）
+_SEARCH_PATH_FILTERS = {
+    None: "",
+    "prefix": " AND m.path LIKE ?",
+    "depth": (
+        " AND (m.path = ? OR (m.path >= ? AND m.path < ?))"
+        " AND length(m.path) - length(replace(m.path, ?, '')) <= ?"
+    ),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _search_sql(
+    query_kind: str,
+    path_mode: Optional[str],
+    has_type_filter: bool,
+    sort_column: str,
+    ascending: bool,
+) -> str:
+    """
+    検索条件の組み合わせごとに1つのSQL文字列を組み立てる（キャッシュ付き）
+
+    同じ組み合わせでは常に同じ文字列になるため、sqlite3のステートメントキャッシュに載る。
+    """
+    sql = _SEARCH_SOURCES[query_kind] + _SEARCH_PATH_FILTERS[path_mode]
+    if has_type_filter:
+        sql += " AND m.type = ?"
+    sql += f" ORDER BY m.{sort_column} {'ASC' if ascending else 'DESC'}"
+    return sql + " LIMIT ? OFFSET ?"
+
+
 class IndexService:
     """ファイルインデックス管理サービス"""
 
@@ -21,224 +227,373 @@ class IndexService:
             db_path: SQLiteデータベースファイルのパス
         """
         self.db_path = db_path
-        # スレッドごとに異なる接続を持つためのスレッドローカルストレージ
+        # トランザクションの入れ子の深さをスレッドごとに保持する
         self._local = threading.local()
-        self._trigram_available: Optional[bool] = None  # trigramインデックスの利用可否キャッシュ
-        # 書き込み操作を直列化するためのロック
-        self._lock = threading.Lock()
+        # 書き込み用の単一接続と、読み取り専用接続のプール
+        self._writer_conn: Optional[sqlite3.Connection] = None
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(
+            maxsize=_READER_POOL_SIZE
+        )
+        # trigramインデックスの利用可否キャッシュ（スキーマのバージョン, 利用可否）
+        self._trigram_available: Optional[Tuple[int, bool]] = None
+        self._bulk_depth = 0  # bulk_ingest()の入れ子の深さ（トリガー停止中は1以上）
+        # 有効な監視パスのキャッシュ（解決済みパス -> 登録パス）。register/remove時に破棄
+        self._watch_path_cache: Optional[Dict[str, str]] = None
+        self._watch_path_version = 0
+        # 無視パターンのキャッシュ（追加・削除のたびにバージョンを進めて破棄）
+        self._ignore_patterns_cache: Optional[Tuple[str, ...]] = None
+        self._ignore_rules: Optional[Tuple[int, Optional[_Matcher], Optional[_Matcher]]] = None
+        self._ignore_patterns_version = 0
+        # 書き込み操作を直列化するためのロック（transaction()内から各メソッドを呼べるよう再入可能）
+        self._lock = threading.RLock()
+        # 単一行書き込みをまとめてコミットする書き込みスレッド（初回書き込み時に起動）
+        self._write_queue: "queue.Queue[Optional[Tuple[str, Sequence[Any], Future[None]]]]" = (
+            queue.Queue()
+        )
+        self._writer: Optional[threading.Thread] = None
+        self._writer_start_lock = threading.Lock()
 
     def _get_connection(self) -> sqlite3.Connection:
-        """データベース接続を取得（スレッドセーフ）"""
-        if not hasattr(self._local, "conn") or self._local.conn is None:
-            self._local.conn = sqlite3.connect(
-                self.db_path, check_same_thread=False, timeout=30.0
-            )  # check_same_thread=Falseは不要だが念のため
-            self._local.conn.row_factory = sqlite3.Row
-            # WALモードをスレッドごとに有効化（必要であれば）
-            self._local.conn.execute("PRAGMA journal_mode = WAL")
-        return self._local.conn
+        """書き込み用の接続を取得（全スレッドで共有。利用は self._lock の保持中に限る）"""
+        if self._writer_conn is None:
+            with self._lock:
+                if self._writer_conn is None:
+                    # isolation_level=None: 暗黙のBEGIN（DEFERRED）を無効にし、
+                    # トランザクションは常に明示的なBEGIN IMMEDIATE/COMMITで管理する
+                    conn = sqlite3.connect(
+                        self.db_path,
+                        check_same_thread=False,
+                        timeout=30.0,
+                        cached_statements=_CACHED_STATEMENTS,
+                        isolation_level=None,
+                    )
+                    conn.row_factory = sqlite3.Row
+                    self._configure_connection(conn)
+                    self._writer_conn = conn
+        return self._writer_conn
 
-    def init_db(self) -> None:
-        """データベースを初期化"""
-        # ディレクトリが存在しない場合は作成
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-
-            # WALモードを有効化（並行読み書き可能）
-            cursor.execute("PRAGMA journal_mode = WAL")
+    @staticmethod
+    def _configure_connection(conn: sqlite3.Connection) -> None:
+        """接続確立時に一度だけPRAGMAを設定（以降はこの接続を使い回す）"""
+        # page_sizeは空のDBにのみ有効（WAL化より前に設定する必要がある）
+        if conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+            conn.execute("PRAGMA page_size = 4096")
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+
+    def _open_reader(self) -> sqlite3.Connection:
+        """読み取り専用の接続を開く（mode=ro）"""
+        conn = sqlite3.connect(
+            f"{Path(self.db_path).resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            timeout=30.0,
+            cached_statements=_CACHED_STATEMENTS,
+            isolation_level=None,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in _READER_PRAGMAS:
+            conn.execute(pragma)
+        return conn
 
-        # メタデータテーブル
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS file_metadata (
-                id INTEGER PRIMARY KEY,
-                path TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                parent_path TEXT NOT NULL,
-                type TEXT NOT NULL,
-                extension TEXT,
-                size INTEGER,
-                mtime REAL,
-                indexed_at REAL
-            )
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
         """
-        )
+        読み取り用の接続をプールから借りる
 
-        # パスにインデックスを作成（検索高速化）
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_file_metadata_path
-            ON file_metadata(path)
+        WALモードでは読み取りが書き込みをブロックしないため、検索は
+        書き込み用接続のロックを待たずに並行して実行できる。
+        transaction()ブロック内では未コミットの変更を読めるよう書き込み用接続を使う。
         """
-        )
+        if getattr(self._local, "tx_depth", 0):
+            yield self._get_connection()
+            return
 
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_file_metadata_parent_path
-            ON file_metadata(parent_path)
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._open_reader()
+        try:
+            yield conn
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
         """
-        )
+        複数の書き込みを1トランザクションにまとめる
 
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_file_metadata_type
-            ON file_metadata(type)
+        ブロック内の書き込みメソッドは個別にコミットせず、
+        ブロック終了時に一度だけCOMMITする。例外時はROLLBACK。
+        書き込みロックは開始時に取得する（BEGIN IMMEDIATE）ため、
+        途中でロックを昇格できずにSQLITE_BUSYになることがない。
         """
-        )
+        with self._lock:
+            conn = self._get_connection()
+            depth = getattr(self._local, "tx_depth", 0)
+            if depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            self._local.tx_depth = depth + 1
+            try:
+                yield conn
+            except BaseException:
+                self._local.tx_depth = depth
+                if depth == 0:
+                    conn.execute("ROLLBACK")
+                    self._invalidate_watch_paths()
+                    self._invalidate_ignore_patterns_if_changed()
+                raise
+            self._local.tx_depth = depth
+            if depth == 0:
+                conn.execute("COMMIT")
+                # ブロック内の監視パス変更はコミット後に確定するため、ここでも破棄する
+                self._invalidate_watch_paths()
+                self._invalidate_ignore_patterns_if_changed()
+
+    def _submit_write(self, sql: str, params: Sequence[Any]) -> None:
+        """
+        単一行の書き込みを書き込みスレッドへ投入し、コミット完了まで待機する
 
-        # ファイル名にインデックスを作成（LIKE検索の高速化）
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_file_metadata_name
-            ON file_metadata(name)
+        複数スレッドから同時に投入された書き込みは、書き込みスレッドが
+        1トランザクションにまとめてコミットする（グループコミット）。
+        transaction()ブロック内では呼び出し元の接続でそのまま実行する。
         """
-        )
+        if getattr(self._local, "tx_depth", 0):
+            self._get_connection().execute(sql, params)
+            return
 
-        # FTS5仮想テーブル（全文検索用）- レガシー、後方互換性のため残す
-        cursor.execute(
-            """
-            CREATE VIRTUAL TABLE IF NOT EXISTS file_index USING fts5(
-                path,
-                name,
-                parent_path,
-                content='file_metadata',
-                content_rowid='id'
-            )
+        future: "Future[None]" = Future()
+        self._ensure_writer()
+        self._write_queue.put((sql, params, future))
+        future.result()
+
+    def _ensure_writer(self) -> None:
+        """書き込みスレッドが起動していなければ起動する"""
+        with self._writer_start_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._writer_loop, name="index-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _writer_loop(self) -> None:
+        """キューに溜まった書き込みをまとめて1トランザクションで適用する"""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+
+            # 待機中の書き込みを最大件数まで取り出す（追加の待ち時間は設けない）
+            batch = [item]
+            stop = False
+            while len(batch) < _WRITE_BATCH_MAX:
+                try:
+                    item = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._apply_write_batch(batch)
+            if stop:
+                return
+
+    def _apply_write_batch(self, batch: List[Tuple[str, Sequence[Any], "Future[None]"]]) -> None:
         """
-        )
+        書き込みバッチを適用し、すべての呼び出し元の待機を解除する
 
-        # FTS5 trigram仮想テーブル（日本語部分一致対応の高速検索用）
-        # trigramトークナイザーは3文字単位でインデックスを作成し、部分一致検索が可能
+        接続の取得やROLLBACK自体が失敗しても書き込みスレッドを止めず、
+        未完了の呼び出しにはその例外を返す（呼び出し元が待ち続けないようにする）。
+        """
         try:
+            self._execute_write_batch(batch)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _execute_write_batch(self, batch: List[Tuple[str, Sequence[Any], "Future[None]"]]) -> None:
+        """書き込みバッチを実行（同じSQLが連続する区間はexecutemanyで実行）"""
+        with self._lock:
+            conn = self._get_connection()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for sql, group in itertools.groupby(batch, key=lambda item: item[0]):
+                    if sql:
+                        conn.executemany(sql, [params for _, params, _ in group])
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # 1件ずつ（自動コミットで）再実行し、失敗した呼び出しにのみ例外を返す
+                for sql, params, future in batch:
+                    try:
+                        if sql:
+                            conn.execute(sql, params)
+                    except Exception as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(None)
+                return
+
+        for _, _, future in batch:
+            future.set_result(None)
+
+    def flush(self) -> None:
+        """投入済みの書き込みがすべてコミットされるまで待機"""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        # 空のSQLは書き込みスレッド側で読み飛ばされる（待機用のマーカー）
+        self._submit_write("", ())
+
+    def init_db(self) -> None:
+        """データベースを初期化（スキーマ作成と二次インデックス作成）"""
+        self.init_schema()
+        self.finalize_indexes()
+
+    def finalize_indexes(self) -> None:
+        """
+        file_metadataの二次インデックスを作成
+
+        大量取り込み時は挿入後にまとめて作成した方が速いため、
+        init_schema() とは分けている（作成済みであれば何もしない）。
+        """
+        with self.transaction() as conn:
+            for _, ddl in _SECONDARY_INDEXES:
+                conn.execute(ddl)
+
+    def init_schema(self) -> None:
+        """テーブル・FTS5仮想テーブル・トリガーを作成"""
+        # ディレクトリが存在しない場合は作成
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+
+            # メタデータテーブル
             cursor.execute(
                 """
-                CREATE VIRTUAL TABLE IF NOT EXISTS file_name_index USING fts5(
-                    name,
-                    content='file_metadata',
-                    content_rowid='id',
-                    tokenize='trigram'
+                CREATE TABLE IF NOT EXISTS file_metadata (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    name TEXT NOT NULL,
+                    parent_path TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    extension TEXT,
+                    size INTEGER,
+                    mtime REAL,
+                    indexed_at REAL
                 )
             """
             )
-            # trigramインデックス用のトリガー
+
+            # pathはUNIQUE制約の自動インデックスで検索できるため、重複する旧インデックスは削除
+            cursor.execute("DROP INDEX IF EXISTS idx_file_metadata_path")
+
+            # 旧FTS5仮想テーブル（path/name/parent_path）は検索に使われていないため削除
+            for name in _LEGACY_FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute("DROP TABLE IF EXISTS file_index")
+
+            # FTS5 trigram仮想テーブル（日本語部分一致対応の高速検索用）
+            # trigramトークナイザーは3文字単位でインデックスを作成し、部分一致検索が可能
+            try:
+                cursor.execute(
+                    """
+                    CREATE VIRTUAL TABLE IF NOT EXISTS file_name_index USING fts5(
+                        name,
+                        content='file_metadata',
+                        content_rowid='id',
+                        tokenize='trigram'
+                    )
+                """
+                )
+                # trigramインデックス用のトリガー
+                # bulk_ingest()の途中で終了した場合はトリガーが無く索引も古いため再構築する
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                    (_TRIGRAM_TRIGGERS[0][0],),
+                )
+                needs_rebuild = cursor.fetchone() is None
+                for _, ddl in _TRIGRAM_TRIGGERS:
+                    cursor.execute(ddl)
+                if needs_rebuild:
+                    cursor.execute("INSERT INTO file_name_index(file_name_index) VALUES ('rebuild')")
+            except sqlite3.OperationalError:
+                # trigramトークナイザーが利用できない場合（SQLite < 3.34）はスキップ
+                pass
+
+            # bigramテーブル（2文字検索高速化用）
+            # FTS5 trigramは3文字未満の部分文字列にマッチしないため、2文字検索用に別途保持する
+            # ファイル名から全ての2文字ペアを抽出して格納
+            self._migrate_bigram_table(cursor)
             cursor.execute(
                 """
-                CREATE TRIGGER IF NOT EXISTS file_metadata_ai_trigram AFTER INSERT ON file_metadata BEGIN
-                    INSERT INTO file_name_index(rowid, name)
-                    VALUES (new.id, new.name);
-                END
+                CREATE TABLE IF NOT EXISTS file_name_bigrams (
+                    bigram TEXT NOT NULL,
+                    file_id INTEGER NOT NULL,
+                    PRIMARY KEY (bigram, file_id),
+                    FOREIGN KEY (file_id) REFERENCES file_metadata(id) ON DELETE CASCADE
+                ) WITHOUT ROWID
             """
             )
+
+            # ファイル削除時（ON DELETE CASCADE）のルックアップ用
             cursor.execute(
                 """
-                CREATE TRIGGER IF NOT EXISTS file_metadata_ad_trigram AFTER DELETE ON file_metadata BEGIN
-                    INSERT INTO file_name_index(file_name_index, rowid, name)
-                    VALUES ('delete', old.id, old.name);
-                END
+                CREATE INDEX IF NOT EXISTS idx_file_name_bigrams_file_id
+                ON file_name_bigrams(file_id)
             """
             )
+
+            # 監視パステーブル
             cursor.execute(
                 """
-                CREATE TRIGGER IF NOT EXISTS file_metadata_au_trigram AFTER UPDATE ON file_metadata BEGIN
-                    INSERT INTO file_name_index(file_name_index, rowid, name)
-                    VALUES ('delete', old.id, old.name);
-                    INSERT INTO file_name_index(rowid, name)
-                    VALUES (new.id, new.name);
-                END
+                CREATE TABLE IF NOT EXISTS watch_paths (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    enabled INTEGER DEFAULT 1,
+                    total_files INTEGER DEFAULT 0,
+                    indexed_files INTEGER DEFAULT 0,
+                    status TEXT DEFAULT 'idle',
+                    last_full_scan REAL,
+                    last_updated REAL,
+                    error_message TEXT
+                )
             """
             )
-        except sqlite3.OperationalError:
-            # trigramトークナイザーが利用できない場合（SQLite < 3.34）はスキップ
-            pass
 
-        # bigramテーブル（2文字検索高速化用）
-        # ファイル名から全ての2文字ペアを抽出して格納
-        cursor.execute(
+            # 無視パターンのテーブル
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ignore_patterns (
+                    id INTEGER PRIMARY KEY,
+                    pattern TEXT UNIQUE NOT NULL
+                )
             """
-            CREATE TABLE IF NOT EXISTS file_name_bigrams (
-                file_id INTEGER NOT NULL,
-                bigram TEXT NOT NULL,
-                FOREIGN KEY (file_id) REFERENCES file_metadata(id) ON DELETE CASCADE
             )
-        """
-        )
 
-        # bigramにインデックスを作成（高速ルックアップ用）
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_file_name_bigrams_bigram
-            ON file_name_bigrams(bigram)
-        """
-        )
-
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_file_name_bigrams_file_id
-            ON file_name_bigrams(file_id)
-        """
-        )
-
-        # FTS5トリガー（メタデータテーブルと同期）
-        cursor.execute(
-            """
-            CREATE TRIGGER IF NOT EXISTS file_metadata_ai AFTER INSERT ON file_metadata BEGIN
-                INSERT INTO file_index(rowid, path, name, parent_path)
-                VALUES (new.id, new.path, new.name, new.parent_path);
-            END
-        """
-        )
-
-        cursor.execute(
-            """
-            CREATE TRIGGER IF NOT EXISTS file_metadata_ad AFTER DELETE ON file_metadata BEGIN
-                INSERT INTO file_index(file_index, rowid, path, name, parent_path)
-                VALUES ('delete', old.id, old.path, old.name, old.parent_path);
-            END
-        """
-        )
-
-        cursor.execute(
-            """
-            CREATE TRIGGER IF NOT EXISTS file_metadata_au AFTER UPDATE ON file_metadata BEGIN
-                INSERT INTO file_index(file_index, rowid, path, name, parent_path)
-                VALUES ('delete', old.id, old.path, old.name, old.parent_path);
-                INSERT INTO file_index(rowid, path, name, parent_path)
-                VALUES (new.id, new.path, new.name, new.parent_path);
-            END
+    @staticmethod
+    def _migrate_bigram_table(cursor: sqlite3.Cursor) -> None:
         """
-        )
+        旧形式（rowidテーブル + bigram列の別インデックス）のbigramテーブルを削除する
 
-        # 監視パステーブル
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS watch_paths (
-                id INTEGER PRIMARY KEY,
-                path TEXT UNIQUE NOT NULL,
-                enabled INTEGER DEFAULT 1,
-                total_files INTEGER DEFAULT 0,
-                indexed_files INTEGER DEFAULT 0,
-                status TEXT DEFAULT 'idle',
-                last_full_scan REAL,
-                last_updated REAL,
-                error_message TEXT
-            )
+        新形式は(bigram, file_id)を主キーとするWITHOUT ROWIDテーブルで、
+        主キー自体が検索用インデックスを兼ねる。削除後は
+        ensure_bigram_index_populated() が既存データから再構築する。
         """
-        )
-
-        # 無視パターンのテーブル
         cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS ignore_patterns (
-                id INTEGER PRIMARY KEY,
-                pattern TEXT UNIQUE NOT NULL
-            )
-        """
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'file_name_bigrams'"
         )
-
-        conn.commit()
+        row = cursor.fetchone()
+        if row is not None and "WITHOUT ROWID" not in row[0].upper():
+            cursor.execute("DROP INDEX IF EXISTS idx_file_name_bigrams_bigram")
+            cursor.execute("DROP TABLE file_name_bigrams")
 
     def add_file(
         self,
@@ -251,68 +606,47 @@ class IndexService:
         mtime: float,
     ) -> None:
         """ファイルをインデックスに追加"""
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute(
-                """
-                INSERT OR REPLACE INTO file_metadata
-                (path, name, parent_path, type, extension, size, mtime, indexed_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                (path, name, parent_path, file_type, extension, size, mtime, time.time()),
-            )
-            conn.commit()
+        self._submit_write(
+            """
+            INSERT OR REPLACE INTO file_metadata
+            (path, name, parent_path, type, extension, size, mtime, indexed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            (path, name, parent_path, file_type, extension, size, mtime, time.time()),
+        )
 
     def get_file(self, path: str) -> Optional[Dict[str, Any]]:
         """パスでファイル情報を取得"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._reader() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM file_metadata WHERE path = ?", (path,))
-        row = cursor.fetchone()
+            cursor.execute("SELECT * FROM file_metadata WHERE path = ?", (path,))
+            row = cursor.fetchone()
 
-        if row is None:
-            return None
+            if row is None:
+                return None
 
-        return dict(row)
+            return dict(row)
 
     def update_file(self, path: str, **kwargs) -> None:
         """ファイル情報を更新"""
         if not kwargs:
             return
 
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-
-            # 更新するカラムと値を構築
-            set_clause = ", ".join(f"{k} = ?" for k in kwargs.keys())
-            values = list(kwargs.values()) + [path]
-
-            cursor.execute(
-                f"UPDATE file_metadata SET {set_clause} WHERE path = ?",
-                values,
-            )
-            conn.commit()
+        # 更新するカラムの組み合わせごとに同じSQL文字列を使い、ステートメントキャッシュに載せる
+        values = list(kwargs.values()) + [path]
+        self._submit_write(_update_file_sql(tuple(kwargs)), values)
 
     def remove_file(self, path: str) -> None:
         """ファイルをインデックスから削除"""
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("DELETE FROM file_metadata WHERE path = ?", (path,))
-            conn.commit()
+        self._submit_write("DELETE FROM file_metadata WHERE path = ?", (path,))
 
     def batch_add_files(self, files: List[Dict[str, Any]]) -> None:
         """バッチでファイルを追加"""
         if not files:
             return
 
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
 
             indexed_at = time.time()
@@ -325,22 +659,29 @@ class IndexService:
             """,
                 [{**f, "indexed_at": indexed_at} for f in files],
             )
-            conn.commit()
+
+    def batch_remove_files(self, paths: List[str]) -> None:
+        """バッチでファイルを削除"""
+        if not paths:
+            return
+
+        with self.transaction() as conn:
+            conn.executemany(
+                "DELETE FROM file_metadata WHERE path = ?", [(p,) for p in paths]
+            )
 
     def get_file_count(self) -> int:
         """インデックス内のファイル数を取得"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._reader() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT COUNT(*) FROM file_metadata")
-        return cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM file_metadata")
+            return cursor.fetchone()[0]
 
     @staticmethod
     def _extract_bigrams(name: str) -> List[str]:
-        """ファイル名から全ての2文字ペア（bigram）を抽出"""
-        if len(name) < 2:
-            return []
-        return [name[i : i + 2] for i in range(len(name) - 1)]
+        """ファイル名から重複のない全ての2文字ペア（bigram）を抽出"""
+        return list({a + b for a, b in zip(name, name[1:])})
 
     def _add_bigrams_for_file(self, file_id: int, name: str) -> None:
         """ファイルのbigramをインデックスに追加"""
@@ -348,133 +689,171 @@ class IndexService:
         if not bigrams:
             return
 
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
 
-            # 重複を除去してバッチ挿入
-            unique_bigrams = list(set(bigrams))
             cursor.executemany(
                 "INSERT INTO file_name_bigrams (file_id, bigram) VALUES (?, ?)",
-                [(file_id, bg) for bg in unique_bigrams],
+                [(file_id, bg) for bg in bigrams],
             )
 
     def _remove_bigrams_for_file(self, file_id: int) -> None:
         """ファイルのbigramをインデックスから削除"""
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM file_name_bigrams WHERE file_id = ?", (file_id,))
 
     def rebuild_bigram_index(self) -> None:
         """bigramインデックスを既存データから再構築"""
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
 
             # 既存のbigramインデックスをクリア
             cursor.execute("DELETE FROM file_name_bigrams")
 
             # 全ファイルからbigramを抽出して挿入
-            cursor.execute("SELECT id, name FROM file_metadata")
-            rows = cursor.fetchall()
-
-            bigram_data = []
-            for row in rows:
-                file_id = row[0]
-                name = row[1]
-                bigrams = self._extract_bigrams(name)
-                unique_bigrams = list(set(bigrams))
-                bigram_data.extend([(file_id, bg) for bg in unique_bigrams])
-
-            # バッチ挿入
-            if bigram_data:
-                cursor.executemany(
-                    "INSERT INTO file_name_bigrams (file_id, bigram) VALUES (?, ?)",
-                    bigram_data,
-                )
+            # 読み出し用に別カーソルを使い、全bigramをリストに溜めずストリーミングで渡す
+            rows = conn.execute("SELECT id, name FROM file_metadata")
+            cursor.executemany(
+                "INSERT INTO file_name_bigrams (file_id, bigram) VALUES (?, ?)",
+                (
+                    (file_id, bigram)
+                    for file_id, name in rows
+                    for bigram in self._extract_bigrams(name)
+                ),
+            )
 
-            conn.commit()
 
     def ensure_bigram_index_populated(self) -> None:
         """bigramインデックスが空の場合、既存データから構築"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._reader() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute("SELECT COUNT(*) FROM file_name_bigrams")
-            bigram_count = cursor.fetchone()[0]
+            try:
+                cursor.execute("SELECT COUNT(*) FROM file_name_bigrams")
+                bigram_count = cursor.fetchone()[0]
 
-            cursor.execute("SELECT COUNT(*) FROM file_metadata")
-            metadata_count = cursor.fetchone()[0]
+                cursor.execute("SELECT COUNT(*) FROM file_metadata")
+                metadata_count = cursor.fetchone()[0]
 
-            # メタデータがあるのにbigramが空なら再構築
-            if metadata_count > 0 and bigram_count == 0:
-                self.rebuild_bigram_index()
-        except sqlite3.OperationalError:
-            pass  # テーブルが存在しない場合は無視
+                # メタデータがあるのにbigramが空なら再構築
+                if metadata_count > 0 and bigram_count == 0:
+                    self.rebuild_bigram_index()
+            except sqlite3.OperationalError:
+                pass  # テーブルが存在しない場合は無視
 
-    def _has_trigram_index(self) -> bool:
-        """trigramインデックスが利用可能かチェック（キャッシュ付き）"""
-        if self._trigram_available is not None:
-            return self._trigram_available
+    def _has_trigram_index(self, conn: Optional[sqlite3.Connection] = None) -> bool:
+        """
+        trigramインデックスが利用可能かチェック（キャッシュ付き）
+
+        キャッシュはスキーマのバージョン（PRAGMA schema_version）ごとに保持し、
+        テーブルの作成・削除後は自動的に判定し直す。
+
+        Args:
+            conn: 使用する接続（省略時は読み取り用の接続を借りる）
+        """
+        if conn is None:
+            with self._reader() as reader:
+                return self._has_trigram_index(reader)
+
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        cached = self._trigram_available
+        if cached is not None and cached[0] == schema_version:
+            return cached[1]
 
-        conn = self._get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute(
+            row = conn.execute(
                 "SELECT name FROM sqlite_master WHERE type='table' AND name='file_name_index'"
-            )
-            self._trigram_available = cursor.fetchone() is not None
+            ).fetchone()
+            available = row is not None
         except sqlite3.OperationalError:
-            self._trigram_available = False
-        return self._trigram_available
+            available = False
+        self._trigram_available = (schema_version, available)
+        return available
 
     def rebuild_trigram_index(self) -> None:
         """trigramインデックスを既存データから再構築"""
         if not self._has_trigram_index():
             return
 
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
 
-            # 既存のtrigramインデックスをクリア
+            # 外部コンテンツテーブルから全データを再インデックス
+            # （トリガー停止中に古くなった索引でも正しく作り直せる）
             try:
-                cursor.execute("DELETE FROM file_name_index")
+                cursor.execute("INSERT INTO file_name_index(file_name_index) VALUES ('rebuild')")
             except sqlite3.OperationalError:
                 return  # trigramテーブルが存在しない場合
 
-            # 全データを再インデックス
-            cursor.execute(
-                """
-                INSERT INTO file_name_index(rowid, name)
-                SELECT id, name FROM file_metadata
-            """
-            )
-            conn.commit()
-
     def ensure_trigram_index_populated(self) -> None:
         """trigramインデックスが空の場合、既存データから構築"""
         if not self._has_trigram_index():
             return
 
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._reader() as conn:
+            cursor = conn.cursor()
+
+            # trigramインデックスのエントリ数を確認
+            try:
+                cursor.execute("SELECT COUNT(*) FROM file_name_index")
+                trigram_count = cursor.fetchone()[0]
+
+                cursor.execute("SELECT COUNT(*) FROM file_metadata")
+                metadata_count = cursor.fetchone()[0]
 
-        # trigramインデックスのエントリ数を確認
+                # メタデータがあるのにtrigramが空なら再構築
+                if metadata_count > 0 and trigram_count == 0:
+                    self.rebuild_trigram_index()
+            except sqlite3.OperationalError:
+                pass  # テーブルが存在しない場合は無視
+
+    @contextmanager
+    def bulk_ingest(self) -> Iterator[None]:
+        """
+        大量取り込み用のブロック
+
+        ブロック内ではFTS5同期トリガーと二次インデックスを削除し、batch_add_files() は
+        file_metadata への挿入のみを行う。ブロック終了時にFTS5インデックスを
+        一括で再構築し、トリガーと二次インデックスを作り直す。
+        """
+        self.begin_bulk_ingest()
         try:
-            cursor.execute("SELECT COUNT(*) FROM file_name_index")
-            trigram_count = cursor.fetchone()[0]
+            yield
+        finally:
+            self.end_bulk_ingest()
 
-            cursor.execute("SELECT COUNT(*) FROM file_metadata")
-            metadata_count = cursor.fetchone()[0]
+    def begin_bulk_ingest(self) -> None:
+        """FTS5同期トリガーと二次インデックスを削除する（入れ子の場合は最初の呼び出しのみ）"""
+        with self._lock:
+            self._bulk_depth += 1
+            if self._bulk_depth > 1:
+                return
+
+            with self.transaction() as conn:
+                for name, _ in _TRIGRAM_TRIGGERS:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                for name, _ in _SECONDARY_INDEXES:
+                    conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def end_bulk_ingest(self) -> None:
+        """FTS5インデックスを再構築し、同期トリガーと二次インデックスを作り直す"""
+        with self._lock:
+            self._bulk_depth -= 1
+            if self._bulk_depth > 0:
+                return
 
-            # メタデータがあるのにtrigramが空なら再構築
-            if metadata_count > 0 and trigram_count == 0:
-                self.rebuild_trigram_index()
-        except sqlite3.OperationalError:
-            pass  # テーブルが存在しない場合は無視
+            with self.transaction() as conn:
+                if self._has_trigram_index(conn):
+                    for _, ddl in _TRIGRAM_TRIGGERS:
+                        conn.execute(ddl)
+                    conn.execute("INSERT INTO file_name_index(file_name_index) VALUES ('rebuild')")
+                    conn.execute("INSERT INTO file_name_index(file_name_index) VALUES ('optimize')")
+
+            self.finalize_indexes()
+
+            # 取り込み後のデータ分布でクエリプランナーの統計を更新
+            conn.execute("ANALYZE")
 
     def search(
         self,
@@ -495,119 +874,62 @@ class IndexService:
         - 2文字: bigramインデックス（高速）
         - 1文字: LIKE検索（フォールバック）
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # 使用するインデックスタイプを追跡（パスフィルタ時のテーブルエイリアス判定用）
-        using_indexed_search = False
-
-        if query:
-            query_len = len(query)
+        with self._reader() as conn:
+            params: List[Any] = []
 
-            if self._has_trigram_index() and query_len >= 3:
+            if not query:
+                # 空クエリの場合は全件取得
+                query_kind = "all"
+            elif len(query) >= 3 and self._has_trigram_index(conn):
                 # 3文字以上: FTS5 trigram検索（高速）
-                sql = """
-                    SELECT m.*
-                    FROM file_metadata m
-                    JOIN file_name_index fi ON m.id = fi.rowid
-                    WHERE file_name_index MATCH ?
-                """
-                params: List[Any] = [f'"{query}"']
-                using_indexed_search = True
-            elif query_len == 2:
+                # クエリ全体を1つのフレーズとして渡す（"は""にエスケープし、FTS5構文として解釈させない）
+                query_kind = "fts"
+                params.append('"' + query.replace('"', '""') + '"')
+            elif len(query) == 2:
                 # 2文字: bigramインデックス検索（高速）
-                sql = """
-                    SELECT DISTINCT m.*
-                    FROM file_metadata m
-                    JOIN file_name_bigrams b ON m.id = b.file_id
-                    WHERE b.bigram = ?
-                """
-                params = [query]
-                using_indexed_search = True
+                query_kind = "bigram"
+                params.append(query)
             else:
                 # 1文字: LIKE検索（フォールバック）
-                sql = """
-                    SELECT * FROM file_metadata
-                    WHERE name LIKE ?
-                """
-                params = [f"%{query}%"]
-        else:
-            # 空クエリの場合は全件取得
-            sql = "SELECT * FROM file_metadata WHERE 1=1"
-            params = []
-
-        # パスフィルタ
-        if path_filter:
-            if using_indexed_search:
-                sql += " AND m.path LIKE ?"
-            else:
-                sql += " AND path LIKE ?"
-            params.append(f"{path_filter}%")
-
-        # タイプフィルタ
-        if type_filter and type_filter != "all":
-            if using_indexed_search:
-                sql += " AND m.type = ?"
-            else:
-                sql += " AND type = ?"
-            params.append(type_filter)
-
-        # ソート
-        sort_column = sort if sort in ["name", "path", "size", "mtime"] else "name"
-        sort_direction = "ASC" if ascending else "DESC"
-        if using_indexed_search:
-            sql += f" ORDER BY m.{sort_column} {sort_direction}"
-        else:
-            sql += f" ORDER BY {sort_column} {sort_direction}"
-
-        # 結果数制限
-        # depthフィルタがある場合はSQLでLIMITをかけず（多めに取得）、後でフィルタリングする
-        limit_count = max_results + offset
-        if depth > 0 and path_filter:
-            limit_count = 100000  # 十分に大きな値
-
-        sql += " LIMIT ?"
-        params.append(limit_count)
-
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
-
-        # 階層フィルタリングと結果整形
-        results = []
-        base_path_obj = Path(path_filter) if path_filter and depth > 0 else None
-        skipped = 0
-
-        for row in rows:
-            if len(results) >= max_results:
-                break
-
-            result_dict = dict(row)
-
-            # depthフィルタリング
-            if base_path_obj:
-                try:
-                    p = Path(result_dict["path"])
-                    rel_path = p.relative_to(base_path_obj)
-
-                    # 階層深度（partsの数）がdepthを超えたらスキップ
-                    if len(rel_path.parts) > depth:
-                        continue
-                except (ValueError, RuntimeError):
-                    continue
-
-            # オフセット処理
-            if skipped < offset:
-                skipped += 1
-                continue
-
-            results.append(result_dict)
-
-        return results
+                query_kind = "like"
+                params.append(f"%{query}%")
+
+            # パスフィルタ
+            path_mode = None
+            if path_filter:
+                if depth > 0:
+                    # 階層フィルタ: 基準パス自身と配下のうち、区切り文字の数がdepth以内のもの
+                    path_mode = "depth"
+                    base_path = str(Path(path_filter))
+                    prefix, prefix_end = self._subtree_range(base_path)
+                    params.extend(
+                        [base_path, prefix, prefix_end, os.sep, prefix.count(os.sep) - 1 + depth]
+                    )
+                else:
+                    path_mode = "prefix"
+                    params.append(f"{path_filter}%")
+
+            # タイプフィルタ
+            has_type_filter = bool(type_filter) and type_filter != "all"
+            if has_type_filter:
+                params.append(type_filter)
+
+            # 結果数制限
+            params.extend([max_results, offset])
+
+            sort_column = sort if sort in _SORT_COLUMNS else "name"
+            sql = _search_sql(query_kind, path_mode, has_type_filter, sort_column, ascending)
+
+            # sqlite3.Rowを経由せずタプルで受け取り、カラム名と組み合わせて辞書にする
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(sql, params)
+            columns = tuple(column[0] for column in cursor.description)
+            return [dict(zip(columns, row)) for row in cursor]
 
     def register_path(self, path: str) -> None:
         """監視パスを登録"""
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
 
             cursor.execute(
@@ -617,22 +939,21 @@ class IndexService:
             """,
                 (path, time.time()),
             )
-            conn.commit()
+            self._invalidate_watch_paths()
 
     def get_watch_paths(self) -> List[Dict[str, Any]]:
         """監視パス一覧を取得"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._reader() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM watch_paths ORDER BY path")
-        rows = cursor.fetchall()
+            cursor.execute("SELECT * FROM watch_paths ORDER BY path")
+            rows = cursor.fetchall()
 
-        return [dict(row) for row in rows]
+            return [dict(row) for row in rows]
 
     def update_path_status(self, path: str, status: str) -> None:
         """監視パスのステータスを更新"""
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
 
             cursor.execute(
@@ -643,7 +964,20 @@ class IndexService:
             """,
                 (status, time.time(), path),
             )
-            conn.commit()
+
+    def set_path_error(self, path: str, message: str) -> None:
+        """監視パスをエラー状態にしてメッセージを記録（1回のUPDATE）"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                """
+                UPDATE watch_paths
+                SET status = 'error', error_message = ?, last_updated = ?
+                WHERE path = ?
+            """,
+                (message, time.time(), path),
+            )
 
     def update_path_stats(
         self,
@@ -670,65 +1004,74 @@ class IndexService:
         params.append(time.time())
         params.append(path)
 
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
 
             cursor.execute(
                 f"UPDATE watch_paths SET {', '.join(updates)} WHERE path = ?",
                 params,
             )
-            conn.commit()
 
     def remove_path(self, path: str) -> None:
         """監視パスを削除（関連ファイルも削除）"""
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
 
-            # 関連ファイルを削除（パスで始まるもの）
+            # 関連ファイルを削除（パス自身と配下のもの）
+            # LIKEではインデックスが使われないため、pathの範囲条件で削除する
+            prefix, prefix_end = self._subtree_range(path)
             cursor.execute(
-                "DELETE FROM file_metadata WHERE path LIKE ? OR parent_path LIKE ?",
-                (f"{path}%", f"{path}%"),
+                "DELETE FROM file_metadata WHERE path = ? OR (path >= ? AND path < ?)",
+                (path, prefix, prefix_end),
             )
 
             # 監視パスを削除
             cursor.execute("DELETE FROM watch_paths WHERE path = ?", (path,))
 
-            conn.commit()
+            self._invalidate_watch_paths()
+
+    @staticmethod
+    def _subtree_range(path: str) -> Tuple[str, str]:
+        """
+        パス配下を表す半開区間 [prefix, prefix_end) を返す
+
+        区切り文字を付けるため、"/a/b" に対して "/a/bc" 配下は含まない。
+        """
+        prefix = path.rstrip("/\\") + os.sep
+        return prefix, prefix + "\U0010ffff"
 
     def get_status(self) -> Dict[str, Any]:
         """インデックス状態を取得"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._reader() as conn:
+            cursor = conn.cursor()
 
-        # 監視パス一覧
-        paths = self.get_watch_paths()
+            # 監視パス一覧
+            paths = self.get_watch_paths()
 
-        # 統計の集計
-        cursor.execute(
+            # 統計の集計
+            cursor.execute(
+                """
+                SELECT
+                    COALESCE(SUM(total_files), 0) as total_files,
+                    COALESCE(SUM(indexed_files), 0) as indexed_files
+                FROM watch_paths
             """
-            SELECT
-                COALESCE(SUM(total_files), 0) as total_files,
-                COALESCE(SUM(indexed_files), 0) as indexed_files
-            FROM watch_paths
-        """
-        )
-        row = cursor.fetchone()
+            )
+            row = cursor.fetchone()
 
-        # ready判定: scanning中のパスがなく、少なくとも1つのパスがwatching状態
-        is_ready = (
-            len(paths) > 0
-            and not any(p["status"] == "scanning" for p in paths)
-            and any(p["status"] == "watching" for p in paths)
-        )
+            # ready判定: scanning中のパスがなく、少なくとも1つのパスがwatching状態
+            is_ready = (
+                len(paths) > 0
+                and not any(p["status"] == "scanning" for p in paths)
+                and any(p["status"] == "watching" for p in paths)
+            )
 
-        return {
-            "ready": is_ready,
-            "paths": paths,
-            "total_files": row["total_files"],
-            "indexed_files": row["indexed_files"],
-        }
+            return {
+                "ready": is_ready,
+                "paths": paths,
+                "total_files": row["total_files"],
+                "indexed_files": row["indexed_files"],
+            }
 
     def is_path_indexed(self, path: str) -> bool:
         """
@@ -754,33 +1097,63 @@ class IndexService:
         Returns:
             カバーする監視パス（存在しなければNone）
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # 登録されている全監視パスを取得
-        cursor.execute("SELECT path FROM watch_paths WHERE enabled = 1 ORDER BY length(path) DESC")
-        rows = cursor.fetchall()
-
-        # 正規化
-        check_path = Path(path).resolve()
-        check_path_str = str(check_path)
+        watch_paths = self._get_watch_path_map()
+        if not watch_paths:
+            return None
 
-        for row in rows:
-            watch_path = Path(row["path"]).resolve()
-            watch_path_str = str(watch_path)
+        # まず文字列の正規化のみ（ファイルシステムにアクセスしない）で照合し、
+        # 見つからない場合のみシンボリックリンクを解決して照合し直す
+        normalized = os.path.normpath(os.path.abspath(path))
+        watch_path = self._find_covering(watch_paths, normalized)
+        if watch_path is None:
+            resolved = os.path.realpath(path)
+            if resolved != normalized:
+                watch_path = self._find_covering(watch_paths, resolved)
+        return watch_path
 
-            # 完全一致またはサブパスか確認
-            if check_path_str == watch_path_str:
-                return row["path"]
+    @staticmethod
+    def _find_covering(watch_paths: Dict[str, str], path: str) -> Optional[str]:
+        """
+        自身→親の順に監視パスと照合する
 
-            # check_path が watch_path のサブパスか
-            try:
-                check_path.relative_to(watch_path)
-                return row["path"]
-            except ValueError:
-                continue
+        最初に一致したものが最も深い（＝最長の）監視パスとなる。
+        """
+        while True:
+            watch_path = watch_paths.get(path)
+            if watch_path is not None:
+                return watch_path
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+    def _get_watch_path_map(self) -> Dict[str, str]:
+        """
+        有効な監視パスを {正規化済みパス: 登録パス} の辞書で取得（キャッシュ付き）
 
-        return None
+        登録パスを文字列として正規化したものと、シンボリックリンクを解決したものの
+        両方をキーにする（解決はキャッシュ作成時に一度だけ行う）。
+        """
+        watch_paths = self._watch_path_cache
+        if watch_paths is None:
+            version = self._watch_path_version
+            with self._reader() as conn:
+                rows = conn.execute("SELECT path FROM watch_paths WHERE enabled = 1").fetchall()
+            watch_paths = {}
+            for (registered,) in rows:
+                watch_paths.setdefault(os.path.realpath(registered), registered)
+            for (registered,) in rows:
+                # 文字列として正規化したキーを優先する
+                watch_paths[os.path.normpath(os.path.abspath(registered))] = registered
+            # 読み込み中に変更があった場合はキャッシュしない
+            if version == self._watch_path_version:
+                self._watch_path_cache = watch_paths
+        return watch_paths
+
+    def _invalidate_watch_paths(self) -> None:
+        """監視パスのキャッシュを破棄"""
+        self._watch_path_version += 1
+        self._watch_path_cache = None
 
     async def register_path_async(self, path: str) -> None:
         """
@@ -792,66 +1165,183 @@ class IndexService:
         # 同期メソッドを呼び出し（SQLiteは同期的）
         self.register_path(path)
 
+    def maintenance(self) -> None:
+        """
+        定期メンテナンス（長時間稼働時のWAL肥大化と統計の劣化を防ぐ）
+
+        - WALをチェックポイントしてファイルを切り詰める
+        - PRAGMA optimize で統計が古くなったテーブルのみANALYZEする
+
+        大量取り込み中（begin_bulk_ingest〜end_bulk_ingest）は何もしない。
+        二次インデックスを外した途中状態の統計を取ってしまい、
+        取り込み完了時にもまとめてANALYZEされるため。
+        """
+        with self._lock:
+            if self._bulk_depth:
+                return
+            conn = self._get_connection()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA optimize")
+
     def close(self) -> None:
-        """データベース接続を閉じる（現在のスレッド用）"""
-        if hasattr(self._local, "conn") and self._local.conn is not None:
-            self._local.conn.close()
-            self._local.conn = None
+        """書き込みスレッドを停止し、書き込み用接続とプール内の読み取り接続を閉じる"""
+        with self._writer_start_lock:
+            writer = self._writer
+            if writer is not None and writer.is_alive():
+                self._write_queue.put(None)
+                writer.join()
+            self._writer = None
+
+        with self._lock:
+            if self._writer_conn is not None:
+                # 接続を閉じる前にクエリプランナーの統計を必要な分だけ更新
+                try:
+                    self._writer_conn.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    pass
+                self._writer_conn.close()
+                self._writer_conn = None
+
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
 
     def add_ignore_pattern(self, pattern: str) -> None:
         """無視パターンを追加"""
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT OR IGNORE INTO ignore_patterns (pattern) VALUES (?)", (pattern,)
             )
-            conn.commit()
+            self._local.ignore_patterns_changed = True
 
     def remove_ignore_pattern(self, pattern: str) -> None:
         """無視パターンを削除"""
-        with self._lock:
-            conn = self._get_connection()
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM ignore_patterns WHERE pattern = ?", (pattern,))
-            conn.commit()
+            self._local.ignore_patterns_changed = True
+
+    def _invalidate_ignore_patterns(self) -> None:
+        """無視パターンのキャッシュを破棄"""
+        self._ignore_patterns_version += 1
+        self._ignore_patterns_cache = None
+
+    def _invalidate_ignore_patterns_if_changed(self) -> None:
+        """
+        トランザクション内で無視パターンが変更されていればキャッシュを破棄
+
+        コミット前に破棄すると、その間に読み取り接続が古い行を読み込み
+        新しいバージョンのキャッシュとして保持してしまうため、コミット（またはロールバック）後に呼ぶ。
+        """
+        if getattr(self._local, "ignore_patterns_changed", False):
+            self._local.ignore_patterns_changed = False
+            self._invalidate_ignore_patterns()
+
+    def get_ignore_patterns_version(self) -> int:
+        """無視パターンのバージョン（追加・削除のたびに増加）"""
+        return self._ignore_patterns_version
+
+    def _get_ignore_patterns_tuple(self) -> Tuple[str, ...]:
+        """無視パターンを取得（キャッシュ付き）"""
+        patterns = self._ignore_patterns_cache
+        if patterns is None:
+            version = self._ignore_patterns_version
+            with self._reader() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT pattern FROM ignore_patterns ORDER BY pattern")
+                patterns = tuple(row[0] for row in cursor.fetchall())
+            # 読み込み中に変更があった場合はキャッシュしない
+            if version == self._ignore_patterns_version:
+                self._ignore_patterns_cache = patterns
+        return patterns
 
     def get_ignore_patterns(self) -> List[str]:
         """無視パターン一覧を取得"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT pattern FROM ignore_patterns ORDER BY pattern")
-        return [row[0] for row in cursor.fetchall()]
+        return list(self._get_ignore_patterns_tuple())
 
-    def is_ignored(self, path: str) -> bool:
+    def get_ignore_patterns_set(self) -> FrozenSet[str]:
+        """無視パターンの集合を取得（他の設定との和集合用）"""
+        return frozenset(self._get_ignore_patterns_tuple())
+
+    def _get_ignore_rules(self) -> Tuple[Optional[_Matcher], Optional[_Matcher]]:
         """
-        パスが無視対象かチェックする
-        
-        Args:
-            path: チェックするパス (絶対パスであることが好ましい)
-            
+        無視パターンを正規表現にまとめてコンパイルする（バージョンごとにキャッシュ）
+
         Returns:
-            無視対象であれば True
+            (フルパス用のmatch, パス要素用のsearch)。該当パターンが無ければNone
         """
-        patterns = self.get_ignore_patterns()
+        version = self._ignore_patterns_version
+        rules = self._ignore_rules
+        if rules is not None and rules[0] == version:
+            return rules[1], rules[2]
+
+        # 空文字列のパターンは空の選択肢となり全パスに一致してしまうため除外する
+        patterns = [p for p in self._get_ignore_patterns_tuple() if p]
+        # fnmatch.fnmatchと同様にパターン・パスともnormcaseして比較する
+        full_match = self._compile_patterns(patterns)
+        # セパレータを含まないパターンのみパスの各要素に対して照合する (例: "src/foo" は部分一致させない)
+        name_search = self._compile_name_patterns(
+            [p for p in patterns if "/" not in p and "\\" not in p]
+        )
+        self._ignore_rules = (version, full_match, name_search)
+        return full_match, name_search
+
+    @staticmethod
+    def _compile_patterns(patterns: Sequence[str]) -> Optional[_Matcher]:
+        """globパターン群を1つの正規表現に変換"""
         if not patterns:
-            return False
+            return None
+        regex = "|".join(
+            f"(?:{fnmatch.translate(os.path.normcase(p))})" for p in patterns
+        )
+        return re.compile(regex).match
 
-        path_obj = Path(path)
-        path_str = str(path_obj)
-        parts = path_obj.parts
+    @staticmethod
+    def _compile_name_patterns(patterns: Sequence[str]) -> Optional[_Matcher]:
+        """
+        名前単体のglobパターン群を、パス全体を1回走査するだけで
+        いずれかのパス要素に一致するか判定できる正規表現に変換
+        """
+        if not patterns:
+            return None
+        names = "|".join(_translate_name_glob(os.path.normcase(p)) for p in patterns)
+        return re.compile(f"(?:^|[{_SEPARATORS}])(?:{names})(?=[{_SEPARATORS}]|\\Z)").search
+
+    def get_ignore_matcher(self) -> Callable[[str], bool]:
+        """
+        現在の無視パターンで判定する関数を取得
+
+        返す関数は取得時点のパターンで固定される。呼び出し側で保持する場合は
+        get_ignore_patterns_version() が変わったときに取得し直すこと。
+        """
+        full_match, name_search = self._get_ignore_rules()
+        if full_match is None:
+            return lambda path: False
+
+        def matcher(path: str) -> bool:
+            path_str = os.path.normcase(str(Path(path)))
 
-        for pattern in patterns:
             # 1. 単純なglobマッチング (フルパスに対して)
-            if fnmatch.fnmatch(path_str, pattern):
+            if full_match(path_str):
                 return True
-            
+
             # 2. ファイル名/ディレクトリ名単体でのマッチング (例: node_modules, .git)
             # パスの一部にパターンにマッチするものがあれば除外とする
-            # ただし、パターンがセパレータを含まない場合のみ有効 (例: "src/foo" は部分一致させない)
-            if "/" not in pattern and "\\" not in pattern:
-                for part in parts:
-                    if fnmatch.fnmatch(part, pattern):
-                        return True
-                        
-        return False
+            return name_search is not None and name_search(path_str) is not None
+
+        return matcher
+
+    def is_ignored(self, path: str) -> bool:
+        """
+        パスが無視対象かチェックする
+        
+        Args:
+            path: チェックするパス (絶対パスであることが好ましい)
+            
+        Returns:
+            無視対象であれば True
+        """
+        return self.get_ignore_matcher()(path)
@@ -1,20 +1,34 @@
 """
 並列ファイルスキャナー
-- ThreadPoolExecutorを使用した並列ディレクトリスキャン
-- バッチ処理と進捗コールバック
+- ThreadPoolExecutor（またはProcessPoolExecutor）を使用した並列ディレクトリスキャン（発見したディレクトリを逐次投入）
+- os.scandirによる列挙（エントリごとのstatは1回）
+- バッチ処理と進捗コールバック（結果は保持せずコールバックへ逐次渡す）
 - 除外パターンによるフィルタリング
 """
-import asyncio
 import fnmatch
-from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+import functools
+import os
+import re
+import stat
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from pathlib import Path
-from typing import Callable, List, Optional
+from typing import Callable, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple, Union
 
 
-@dataclass
-class FileInfo:
-    """ファイル情報"""
+class FileInfo(NamedTuple):
+    """
+    ファイル情報
+
+    大量に生成されるため、インスタンスごとの__dict__を持たないNamedTupleとする。
+    フィールド名はIndexService.batch_add_filesの辞書キーと一致する。
+    """
 
     path: str
     name: str
@@ -25,238 +39,364 @@ class FileInfo:
     mtime: float
 
 
+# fnmatchのワイルドカード文字
+_GLOB_CHARS = frozenset("*?[")
+
+# Windowsではfnmatchと同様に大文字小文字を区別しない
+_CASE_INSENSITIVE = os.name == "nt"
+
+# ワイルドカード判定結果をキャッシュする名前の数
+_NAME_CACHE_SIZE = 8192
+
+# 1タスクで走査するディレクトリ数の上限（残りは別タスクとして投入する）
+_DIRS_PER_TASK = 32
+
+
+def _compile_name_matcher(
+    patterns: Iterable[str],
+) -> Optional[Callable[[str], Optional[re.Match]]]:
+    """
+    全パターンを1つの正規表現（選択）に結合し、match関数を返す
+
+    fnmatch.fnmatchをパターン数だけ呼ぶ代わりに、1回の正規表現照合で判定する。
+    Windowsではfnmatchと同様に大文字小文字を区別しない。
+    """
+    patterns = sorted(patterns)
+    if not patterns:
+        return None
+    flags = re.IGNORECASE if _CASE_INSENSITIVE else 0
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns), flags).match
+
+
+def _suffix(name: str) -> str:
+    """拡張子を取得（Path.suffixと同じ規則で、Pathオブジェクトを作らない）"""
+    i = name.rfind(".")
+    if 0 < i < len(name) - 1:
+        return name[i:]
+    return ""
+
+
+def _take_full_batches(batch: List[FileInfo], batch_size: int) -> List[List[FileInfo]]:
+    """
+    batchから満杯のバッチをすべて切り出し、端数だけをbatchに残す
+
+    バッチごとに先頭を削除すると残りの要素を毎回詰め直すことになるため、
+    切り出し後にまとめて1回だけ削除する。
+    """
+    full_batches: List[List[FileInfo]] = []
+    start = 0
+    while len(batch) - start >= batch_size:
+        full_batches.append(batch[start : start + batch_size])
+        start += batch_size
+    if start:
+        del batch[:start]
+    return full_batches
+
+
 class ParallelScanner:
     """並列ファイルスキャナー"""
 
     def __init__(
         self,
         max_workers: int = 4,
-        ignore_patterns: Optional[List[str]] = None,
+        ignore_patterns: Optional[Iterable[str]] = None,
         batch_size: int = 1000,
+        use_processes: bool = False,
     ):
         """
         Args:
             max_workers: 並列ワーカー数
-            ignore_patterns: 除外パターンリスト（fnmatch形式）
+            ignore_patterns: 除外パターン（fnmatch形式、list/setいずれも可）
             batch_size: バッチサイズ
+            use_processes: Trueの場合、走査をプロセスプールで行う（GILを回避する。
+                max_workersが1以下の場合はスレッドで行う）
         """
         self.max_workers = max_workers
-        self.ignore_patterns = ignore_patterns or []
+        self.ignore_patterns = frozenset(p for p in ignore_patterns or () if p)
         self.batch_size = batch_size
+        self.use_processes = use_processes
+
+        # パターンを初期化時に分類しておき、エントリごとの判定では分類済みの構造だけを使う
+        # - ワイルドカードを含まないもの: 名前の完全一致（集合）とパスの部分一致
+        # - ワイルドカードを含むもの: 結合済み正規表現で名前を照合
+        literals = [p for p in self.ignore_patterns if not _GLOB_CHARS.intersection(p)]
+        globs = [p for p in self.ignore_patterns if _GLOB_CHARS.intersection(p)]
+        # Windowsではfnmatchと同様に名前の完全一致も大文字小文字を区別しない
+        self._ignore_literals = frozenset(
+            p.lower() if _CASE_INSENSITIVE else p for p in literals
+        )
+        self._ignore_substrings = tuple(sorted(literals))
+        self._ignore_name_match = _compile_name_matcher(globs)
+        # 同じ名前（__pycache__, dist など）は走査中に何度も現れるため、
+        # ワイルドカードの判定結果を名前ごとにキャッシュする（パターンは不変）
+        self._ignore_name_glob: Optional[Callable[[str], bool]] = None
+        if self._ignore_name_match is not None:
+            name_match = self._ignore_name_match
+            self._ignore_name_glob = functools.lru_cache(maxsize=_NAME_CACHE_SIZE)(
+                lambda name: name_match(name) is not None
+            )
 
     def _should_ignore(self, path: Path) -> bool:
+        """
+        パスが除外対象か確認（Pathを受け取る版）
+        """
+        return self._should_ignore_name(path.name, str(path))
+
+    def _should_ignore_name(self, name: str, path_str: str) -> bool:
         """
         パターンに一致するか確認
         - ファイル名がワイルドカードに一致
         - ファイル名がパターンと完全一致
         - パスにパターンが含まれている（部分一致）
         """
-        name = path.name
-        path_str = str(path)
-        for pattern in self.ignore_patterns:
-            if not pattern:
-                continue
-            # ワイルドカードパターンにマッチするか
-            if fnmatch.fnmatch(name, pattern):
-                return True
-            # ディレクトリ名として完全一致するか
-            if name == pattern:
-                return True
-            # パスにパターンが含まれているか
+        # ディレクトリ名として完全一致するか（集合の所属判定）
+        if (name.lower() if _CASE_INSENSITIVE else name) in self._ignore_literals:
+            return True
+        # ワイルドカードパターンにマッチするか（結合済み正規表現で一括判定）
+        if self._ignore_name_glob is not None and self._ignore_name_glob(name):
+            return True
+        # パスにパターンが含まれているか（ワイルドカードを含むパターンは文字列として現れないため対象外）
+        for pattern in self._ignore_substrings:
             if pattern in path_str:
                 return True
         return False
 
-    def _scan_directory_sync(self, path: Path) -> List[FileInfo]:
-        """ディレクトリを同期的にスキャン（単一ディレクトリのみ）"""
-        results: List[FileInfo] = []
+    def _scan_entries(
+        self,
+        directory: str,
+        results: List[FileInfo],
+        subdirs: List[str],
+    ) -> None:
+        """
+        単一ディレクトリを列挙し、結果を渡されたリストに追加する
+
+        os.scandirのDirEntryは種別をディレクトリ読み取り時に取得済みのため、
+        エントリごとのシステムコールはstat1回で済む。
+        シンボリックリンクは辿らない（リンク先のループを防ぐ）。
+        ディレクトリごとに一時リストを作らないよう、呼び出し側のリストへ直接追加する。
+
+        Args:
+            directory: 列挙するディレクトリ
+            results: エントリのFileInfoを追加するリスト
+            subdirs: サブディレクトリのパスを追加するリスト（走査スタックを渡してよい）
+        """
+        # ループ内で繰り返し参照する属性・関数はローカル変数に束縛しておく
+        append_result = results.append
+        append_subdir = subdirs.append
+        should_ignore = self._should_ignore_name
 
         try:
-            for item in path.iterdir():
-                # 除外パターンチェック
-                if self._should_ignore(item):
-                    continue
-
-                try:
-                    stat = item.stat()
-                    is_dir = item.is_dir()
-
-                    file_info = FileInfo(
-                        path=str(item),
-                        name=item.name,
-                        parent_path=str(item.parent),
-                        file_type="directory" if is_dir else "file",
-                        extension=item.suffix if not is_dir else None,
-                        size=0 if is_dir else stat.st_size,
-                        mtime=stat.st_mtime,
-                    )
-                    results.append(file_info)
+            with os.scandir(directory) as it:
+                for entry in it:
+                    name = entry.name
+                    entry_path = entry.path
 
-                except (PermissionError, OSError):
-                    # 権限エラーやその他のOSエラーはスキップ
-                    continue
+                    # 除外パターンチェック
+                    if should_ignore(name, entry_path):
+                        continue
 
-        except (PermissionError, OSError):
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        # 権限エラーやその他のOSエラーはスキップ
+                        continue
+
+                    if is_dir:
+                        append_result(
+                            FileInfo(entry_path, name, directory, "directory", None, 0, st.st_mtime)
+                        )
+                        append_subdir(entry_path)
+                    else:
+                        append_result(
+                            FileInfo(
+                                entry_path,
+                                name,
+                                directory,
+                                "file",
+                                _suffix(name),
+                                st.st_size,
+                                st.st_mtime,
+                            )
+                        )
+
+        except OSError:
             # ディレクトリ自体へのアクセスエラー
             pass
 
+    def _scan_directory_sync(self, path: Union[str, Path]) -> List[FileInfo]:
+        """ディレクトリを同期的にスキャン（単一ディレクトリのみ）"""
+        results: List[FileInfo] = []
+        self._scan_entries(os.fspath(path), results, [])
         return results
 
-    def _scan_recursive_sync(
+    def _scan_tree_chunk(
         self,
-        path: Path,
-        results: List[FileInfo],
-    ) -> None:
-        """ディレクトリを再帰的に同期スキャン"""
-        try:
-            for item in path.iterdir():
-                # 除外パターンチェック
-                if self._should_ignore(item):
-                    continue
-
-                try:
-                    stat = item.stat()
-                    is_dir = item.is_dir()
-
-                    file_info = FileInfo(
-                        path=str(item),
-                        name=item.name,
-                        parent_path=str(item.parent),
-                        file_type="directory" if is_dir else "file",
-                        extension=item.suffix if not is_dir else None,
-                        size=0 if is_dir else stat.st_size,
-                        mtime=stat.st_mtime,
-                    )
-                    results.append(file_info)
+        directory: str,
+        max_dirs: int,
+    ) -> Tuple[List[FileInfo], List[str]]:
+        """
+        ディレクトリ配下を明示的なスタックで走査する（最大max_dirs個のディレクトリまで）
 
-                    # ディレクトリの場合は再帰
-                    if is_dir:
-                        self._scan_recursive_sync(item, results)
+        上限に達した時点で未走査のディレクトリを返し、呼び出し側で
+        別タスクとして投入できるようにする（巨大なサブツリーを1ワーカーに偏らせない）。
+
+        Returns:
+            (走査したエントリのFileInfoリスト, 未走査のディレクトリのパスリスト)
+        """
+        results: List[FileInfo] = []
+        stack = [directory]
+        scan_entries = self._scan_entries
 
-                except (PermissionError, OSError):
-                    continue
+        # 再帰せず、見つけたサブディレクトリはスタックへ直接積む
+        for _ in range(max_dirs):
+            if not stack:
+                break
+            scan_entries(stack.pop(), results, stack)
 
-        except (PermissionError, OSError):
-            pass
+        return results, stack
 
-    async def scan_directory(
+    def scan_directory_stream(
         self,
         path: Path,
         on_batch: Optional[Callable[[List[FileInfo]], None]] = None,
         on_progress: Optional[Callable[[int, int], None]] = None,
-    ) -> List[FileInfo]:
+        batch_in_workers: bool = False,
+    ) -> int:
         """
-        ディレクトリを並列スキャン
+        ディレクトリを並列スキャンし、結果をコールバックへ逐次渡す
+
+        ルート自身も含め、発見したディレクトリは発見した時点で
+        ワーカーに投入する（列挙の完了を待たずに並列処理を開始する）。
+        結果は保持しないため、メモリ使用量はバッチサイズ程度に収まる。
+        ワーカーの完了を待つ間ブロックするため、非同期コードからは
+        asyncio.to_threadで呼び出す。
 
         Args:
             path: スキャン対象ディレクトリ
             on_batch: バッチコールバック（バッチごとに呼ばれる）
             on_progress: 進捗コールバック（scanned, total）
+            batch_in_workers: Trueの場合、on_batchをワーカースレッドから直接呼ぶ
+                （書き込みと走査が重なる。on_batchはスレッドセーフであること）
 
         Returns:
-            FileInfoのリスト
+            スキャンしたエントリ数
         """
-        if not path.exists():
-            raise FileNotFoundError(f"Directory not found: {path}")
+        # 存在確認と種別確認をstat1回で行う
+        try:
+            root_stat = os.stat(path)
+        except OSError:
+            raise FileNotFoundError(f"Directory not found: {path}") from None
 
-        if not path.is_dir():
+        if not stat.S_ISDIR(root_stat.st_mode):
             raise NotADirectoryError(f"Not a directory: {path}")
 
-        loop = asyncio.get_event_loop()
-        all_results: List[FileInfo] = []
         scanned_count = 0
-
-        # まず直下のサブディレクトリを列挙
-        try:
-            subdirs: List[Path] = []
-            direct_items: List[FileInfo] = []
-
-            for item in path.iterdir():
-                if self._should_ignore(item):
-                    continue
-
-                try:
-                    stat = item.stat()
-                    is_dir = item.is_dir()
-
-                    file_info = FileInfo(
-                        path=str(item),
-                        name=item.name,
-                        parent_path=str(item.parent),
-                        file_type="directory" if is_dir else "file",
-                        extension=item.suffix if not is_dir else None,
-                        size=0 if is_dir else stat.st_size,
-                        mtime=stat.st_mtime,
+        batch: List[FileInfo] = []
+        batch_lock = threading.Lock()
+        batch_size = self.batch_size
+        use_processes = self.use_processes and self.max_workers > 1
+        # 別プロセスからはon_batchを呼べないため、プロセスプールでは呼び出し側でまとめる
+        emit_in_workers = batch_in_workers and on_batch is not None and not use_processes
+
+        def scan_chunk(directory: str) -> Tuple[int, List[FileInfo], List[str]]:
+            try:
+                results, remaining = self._scan_tree_chunk(directory, _DIRS_PER_TASK)
+            except Exception:
+                # エラーは無視して続行
+                return 0, [], []
+
+            if not emit_in_workers:
+                return len(results), results, remaining
+
+            # 共有バッチに追加し、満杯になった分はこのワーカーで書き出す
+            with batch_lock:
+                batch.extend(results)
+                full_batches = _take_full_batches(batch, batch_size)
+            for full_batch in full_batches:
+                on_batch(full_batch)
+            return len(results), [], remaining
+
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+        with executor_class(max_workers=self.max_workers) as executor:
+
+            def submit(directory: str) -> Future:
+                if use_processes:
+                    return executor.submit(
+                        _scan_chunk_in_process,
+                        directory,
+                        _DIRS_PER_TASK,
+                        self.ignore_patterns,
                     )
-                    direct_items.append(file_info)
+                return executor.submit(scan_chunk, directory)
 
-                    if is_dir:
-                        subdirs.append(item)
+            pending = {submit(str(path))}
 
-                except (PermissionError, OSError):
-                    continue
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
 
-            all_results.extend(direct_items)
-            scanned_count += len(direct_items)
+                for future in done:
+                    count, chunk_results, remaining = future.result()
 
-            if on_progress:
-                on_progress(scanned_count, -1)  # totalは不明なので-1
+                    # 未走査のサブディレクトリはすぐに次のタスクとして投入
+                    pending.update(submit(d) for d in remaining)
 
-        except (PermissionError, OSError):
-            return all_results
+                    scanned_count += count
 
-        # サブディレクトリを並列スキャン
-        if subdirs:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    if on_progress:
+                        on_progress(scanned_count, -1)  # totalは不明なので-1
 
-                def scan_subdir(subdir: Path) -> List[FileInfo]:
-                    results: List[FileInfo] = []
-                    self._scan_recursive_sync(subdir, results)
-                    return results
+                    # バッチ処理
+                    if on_batch and chunk_results:
+                        batch.extend(chunk_results)
+                        for full_batch in _take_full_batches(batch, batch_size):
+                            on_batch(full_batch)
 
-                # 並列実行
-                futures = [
-                    loop.run_in_executor(executor, scan_subdir, subdir)
-                    for subdir in subdirs
-                ]
+        # 残りのバッチを処理（ワーカーはすべて終了済み）
+        if on_batch and batch:
+            on_batch(batch)
 
-                # 結果を収集
-                batch: List[FileInfo] = []
+        return scanned_count
 
-                for future in asyncio.as_completed(futures):
-                    try:
-                        subdir_results = await future
-                        all_results.extend(subdir_results)
-                        scanned_count += len(subdir_results)
-
-                        if on_progress:
-                            on_progress(scanned_count, -1)
-
-                        # バッチ処理
-                        if on_batch:
-                            batch.extend(subdir_results)
-                            while len(batch) >= self.batch_size:
-                                on_batch(batch[: self.batch_size])
-                                batch = batch[self.batch_size :]
-
-                    except Exception:
-                        # エラーは無視して続行
-                        continue
+    def scan_directory(
+        self,
+        path: Path,
+        on_batch: Optional[Callable[[List[FileInfo]], None]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[FileInfo]:
+        """
+        ディレクトリを並列スキャンし、全結果をリストで返す
 
-                # 残りのバッチを処理
-                if on_batch and batch:
-                    on_batch(batch)
+        全件をメモリに保持するため、大規模なツリーのインデックス登録には
+        scan_directory_streamを使う。
 
+        Args:
+            path: スキャン対象ディレクトリ
+            on_batch: バッチコールバック（バッチごとに呼ばれる）
+            on_progress: 進捗コールバック（scanned, total）
+
+        Returns:
+            FileInfoのリスト
+        """
+        all_results: List[FileInfo] = []
+
+        def collect(batch: List[FileInfo]) -> None:
+            all_results.extend(batch)
+            if on_batch:
+                on_batch(batch)
+
+        self.scan_directory_stream(path, on_batch=collect, on_progress=on_progress)
         return all_results
 
-    async def scan_with_index_service(
+    def scan_with_index_service(
         self,
         path: Path,
         index_service,
         on_progress: Optional[Callable[[int, int], None]] = None,
     ) -> int:
         """
-        ディレクトリをスキャンしてIndexServiceに登録
+        ディレクトリをスキャンしてIndexServiceに登録（ブロッキング）
 
         Args:
             path: スキャン対象ディレクトリ
@@ -266,25 +406,44 @@ class ParallelScanner:
         Returns:
             スキャンしたファイル数
         """
-        total_count = 0
-
         def on_batch(batch: List[FileInfo]):
-            nonlocal total_count
-            files_data = [
-                {
-                    "path": f.path,
-                    "name": f.name,
-                    "parent_path": f.parent_path,
-                    "file_type": f.file_type,
-                    "extension": f.extension,
-                    "size": f.size,
-                    "mtime": f.mtime,
-                }
-                for f in batch
-            ]
+            files_data = [f._asdict() for f in batch]
             index_service.batch_add_files(files_data)
-            total_count += len(batch)
-
-        await self.scan_directory(path, on_batch=on_batch, on_progress=on_progress)
 
-        return total_count
+        # 書き込みはワーカースレッドから直接行い、走査と重ねる
+        # （IndexServiceの書き込みはロックで直列化されるためスレッドセーフ）
+        return self.scan_directory_stream(
+            path, on_batch=on_batch, on_progress=on_progress, batch_in_workers=True
+        )
+
+
+# プロセスプールのワーカーごとに保持するスキャナー（除外パターンのコンパイルを使い回す）
+_process_scanner: Optional[ParallelScanner] = None
+
+
+def _scan_chunk_in_process(
+    directory: str,
+    max_dirs: int,
+    ignore_patterns: FrozenSet[str],
+) -> Tuple[int, List[FileInfo], List[str]]:
+    """
+    プロセスプールのワーカーでディレクトリ配下を走査する
+
+    pickle可能なようにモジュールレベルの関数とし、結果はFileInfo（NamedTuple）で返す。
+
+    Returns:
+        (エントリ数, FileInfoのリスト, 未走査のディレクトリのパスリスト)
+    """
+    global _process_scanner
+    scanner = _process_scanner
+    if scanner is None or scanner.ignore_patterns != ignore_patterns:
+        scanner = _process_scanner = ParallelScanner(
+            max_workers=1, ignore_patterns=ignore_patterns
+        )
+
+    try:
+        results, remaining = scanner._scan_tree_chunk(directory, max_dirs)
+    except Exception:
+        # エラーは無視して続行
+        return 0, [], []
+    return len(results), results, remaining
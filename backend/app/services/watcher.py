@@ -6,15 +6,17 @@
 """
 import asyncio
 import fnmatch
+import os
 import threading
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
 
 from app.services.index_service import IndexService
+from app.services.scanner import _suffix
 
 
 class IndexEventHandler(FileSystemEventHandler):
@@ -37,23 +39,42 @@ class IndexEventHandler(FileSystemEventHandler):
         self.debounce_ms = debounce_ms
         self.ignore_patterns = ignore_patterns or []
 
-        # イベントキュー: {path: (event_type, is_directory, timestamp)}
-        self._pending_events: Dict[str, Tuple[str, bool, float]] = {}
+        # イベントキュー: {path: (op, is_directory, timestamp, is_new)}
+        # - op: "upsert"（created/modifiedを集約）または "deleted"
+        # - is_new: デバウンス期間内の最初のイベントがcreatedだったか
+        self._pending_events: Dict[str, Tuple[str, bool, float, bool]] = {}
         self._lock = threading.Lock()
-        self._timer: Optional[threading.Timer] = None
         self._loop: Optional[asyncio.AbstractEventLoop] = None
 
         # 非同期処理用
         try:
-            self._loop = asyncio.get_event_loop()
+            self._loop = asyncio.get_running_loop()
         except RuntimeError:
             self._loop = asyncio.new_event_loop()
 
+        # 無視判定関数のキャッシュ（パターンのバージョンが変わったら取得し直す）
+        self._ignore_version = -1
+        self._ignore_matcher: Callable[[str], bool] = lambda path: False
+
+        # デバウンス用の常駐ワーカー（イベントごとにスレッドを生成しない）
+        self._wake = threading.Event()
+        self._deadline = 0.0
+        self._stopped = False
+        self._worker = threading.Thread(
+            target=self._debounce_loop, name="index-watcher-debounce", daemon=True
+        )
+        self._worker.start()
+
     def _should_ignore(self, path: str) -> bool:
         """パスが除外パターンに一致するか確認"""
-        # IndexServiceに委譲（DB設定 + config設定）
+        # IndexServiceの無視パターン（DB設定 + config設定）で判定する
         # ただし、config設定はmain.pyでDBに登録される前提
-        return self.index_service.is_ignored(path)
+        # コンパイル済みの判定関数を保持し、パターンが変わったときだけ取得し直す
+        version = self.index_service.get_ignore_patterns_version()
+        if version != self._ignore_version:
+            self._ignore_matcher = self.index_service.get_ignore_matcher()
+            self._ignore_version = version
+        return self._ignore_matcher(path)
 
     def _queue_event(
         self, event_type: str, path: str, is_directory: bool = False
@@ -62,70 +83,118 @@ class IndexEventHandler(FileSystemEventHandler):
         if self._should_ignore(path):
             return
 
+        op = "deleted" if event_type == "deleted" else "upsert"
+
         with self._lock:
-            # 既存のイベントを上書き（最新のイベントのみ保持）
-            self._pending_events[path] = (event_type, is_directory, time.time())
+            previous = self._pending_events.get(path)
+            # on_createdによる作成のみ新規とみなす（移動先はインデックス済みのパスを上書きしうる）
+            is_new = event_type == "created" if previous is None else previous[3]
+
+            if op == "deleted" and is_new:
+                # 期間内に作成されて削除された一時ファイルはインデックスに触れずに捨てる
+                self._pending_events.pop(path, None)
+            else:
+                # 既存のイベントを上書き（最新のイベントのみ保持、後の削除が優先される）
+                self._pending_events[path] = (op, is_directory, time.time(), is_new)
+
+            # 処理予定時刻を延長してワーカーを起こす
+            self._deadline = time.monotonic() + self.debounce_ms / 1000.0
+        self._wake.set()
+
+    def _debounce_loop(self) -> None:
+        """最後のイベントからデバウンス間隔が過ぎたら保留中のイベントを処理"""
+        while True:
+            self._wake.wait()
+            if self._stopped:
+                return
+            self._wake.clear()
+
+            # 待機中に新しいイベントが来たら処理予定時刻まで待ち直す
+            while not self._stopped:
+                remaining = self._deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wake.wait(remaining)
+                self._wake.clear()
+            if self._stopped:
+                return
 
-            # タイマーをリセット
-            if self._timer is not None:
-                self._timer.cancel()
+            try:
+                self._process_pending_events()
+            except Exception as e:
+                # ワーカーを止めないよう、エラーは出力して続行
+                print(f"Error applying file events: {e}")
 
-            # デバウンス後に処理を実行
-            self._timer = threading.Timer(
-                self.debounce_ms / 1000.0, self._process_pending_events
-            )
-            self._timer.start()
+    def stop(self) -> None:
+        """デバウンスワーカーを停止（保留中のイベントは破棄）"""
+        self._stopped = True
+        self._wake.set()
+        self._worker.join(timeout=5)
 
     def _process_pending_events(self) -> None:
-        """保留中のイベントを処理"""
+        """保留中のイベントを処理（複数件は種類ごとにまとめて1トランザクションで適用）"""
         with self._lock:
             events = self._pending_events.copy()
             self._pending_events.clear()
 
-        for path, (event_type, is_directory, _) in events.items():
-            self._apply_event(event_type, path, is_directory)
+        if len(events) == 1:
+            path, (op, is_directory, _, _) = next(iter(events.items()))
+            self._apply_event(op, path, is_directory)
+            return
 
-    def _apply_event(self, event_type: str, path: str, is_directory: bool) -> None:
-        """イベントをインデックスに適用"""
-        path_obj = Path(path)
+        to_upsert: List[Dict[str, Any]] = []
+        to_delete: List[str] = []
+        for path, (op, is_directory, _, _) in events.items():
+            if op == "deleted":
+                to_delete.append(path)
+            else:
+                record = self._file_record(path, is_directory)
+                if record is not None:
+                    to_upsert.append(record)
+
+        self.index_service.batch_remove_files(to_delete)
+        self.index_service.batch_add_files(to_upsert)
+
+    @staticmethod
+    def _file_record(path: str, is_directory: bool) -> Optional[Dict[str, Any]]:
+        """
+        インデックス登録用のファイル情報を作成
 
-        if event_type == "deleted":
+        Returns:
+            ファイル情報の辞書（存在しない・アクセスできない場合はNone）
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # ファイルが存在しない・権限エラーの場合はスキップ
+            return None
+
+        # Pathオブジェクトを作らず文字列操作で名前・親・拡張子を求める（スキャナーと同じ規則）
+        parent_path, name = os.path.split(path)
+        return {
+            "path": path,
+            "name": name,
+            "parent_path": parent_path,
+            "file_type": "directory" if is_directory else "file",
+            "extension": None if is_directory else _suffix(name),
+            "size": 0 if is_directory else stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+
+    def _apply_event(self, op: str, path: str, is_directory: bool) -> None:
+        """集約済みのイベントをインデックスに適用"""
+        if op == "deleted":
             # 削除イベント
             self.index_service.remove_file(path)
 
-        elif event_type in ("created", "modified"):
+        else:
             # 作成または更新イベント
-            if not path_obj.exists():
-                # ファイルが存在しない場合はスキップ
-                return
-
-            try:
-                stat = path_obj.stat()
-
-                self.index_service.add_file(
-                    path=path,
-                    name=path_obj.name,
-                    parent_path=str(path_obj.parent),
-                    file_type="directory" if is_directory else "file",
-                    extension=path_obj.suffix if not is_directory else None,
-                    size=0 if is_directory else stat.st_size,
-                    mtime=stat.st_mtime,
-                )
-            except (PermissionError, OSError):
-                # エラーは無視
-                pass
-
-        elif event_type == "moved":
-            # 移動イベント（削除 + 作成として処理）
-            # 移動元は削除済みなのでスキップ
-            pass
+            record = self._file_record(path, is_directory)
+            if record is not None:
+                self.index_service.add_file(**record)
 
     async def flush(self) -> None:
         """保留中のイベントを即座に処理"""
-        if self._timer is not None:
-            self._timer.cancel()
-            self._timer = None
-
         self._process_pending_events()
 
     # watchdogイベントハンドラー
@@ -148,9 +217,9 @@ class IndexEventHandler(FileSystemEventHandler):
         """ファイル/ディレクトリ移動イベント"""
         # 移動元を削除
         self._queue_event("deleted", event.src_path, event.is_directory)
-        # 移動先を作成
+        # 移動先を作成（既存ファイルへの上書きの場合もあるため新規作成としては扱わない）
         if hasattr(event, "dest_path"):
-            self._queue_event("created", event.dest_path, event.is_directory)
+            self._queue_event("moved", event.dest_path, event.is_directory)
 
 
 class FileWatcher:
@@ -209,6 +278,8 @@ class FileWatcher:
             self._observer.join(timeout=5)
             self._observer = None
 
+        if self._handler is not None:
+            self._handler.stop()
         self._handler = None
         self._running = False
 
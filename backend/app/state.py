@@ -0,0 +1,47 @@
+"""
+アプリケーション共有状態
+- プロセス内で共有するIndexServiceインスタンスを保持
+- 検索APIと管理APIは同じインスタンス（書き込み用接続と読み取り専用接続のプール）を再利用する
+"""
+import threading
+from typing import Optional
+
+from app.config import settings
+from app.services.index_service import IndexService
+
+# グローバルなIndexServiceインスタンス
+_index_service: Optional[IndexService] = None
+_index_service_lock = threading.Lock()
+
+
+def get_index_service() -> IndexService:
+    """
+    共有IndexServiceインスタンスを取得（未初期化なら生成）
+
+    起動処理（DBスレッド）とリクエスト処理から同時に呼ばれても
+    インスタンスがプロセス内で1つになるよう、生成はロック下で行う。
+    """
+    global _index_service
+    service = _index_service
+    if service is not None:
+        return service
+    with _index_service_lock:
+        if _index_service is None:
+            service = IndexService(settings.index_db_full_path)
+            service.init_db()
+            _index_service = service
+        return _index_service
+
+
+def set_index_service(service: Optional[IndexService]) -> None:
+    """共有IndexServiceインスタンスを差し替える"""
+    global _index_service
+    _index_service = service
+
+
+def pop_index_service() -> Optional[IndexService]:
+    """共有IndexServiceインスタンスを取り外して返す（終了処理で閉じる用）"""
+    global _index_service
+    with _index_service_lock:
+        service, _index_service = _index_service, None
+    return service
@@ -85,3 +85,114 @@ class TestConcurrency:
             conn.close()
             
             assert count == total_expected, f"Expected {total_expected} files, but got {count}"
+
+    def test_failed_write_does_not_affect_others(self):
+        """書き込みスレッドで失敗した書き込みは呼び出し元にのみ例外を返す"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_writer.db"
+            service = IndexService(db_path)
+            service.init_db()
+
+            service.add_file(
+                path="/test/a.txt",
+                name="a.txt",
+                parent_path="/test",
+                file_type="file",
+                extension=".txt",
+                size=1,
+                mtime=time.time(),
+            )
+
+            with pytest.raises(sqlite3.OperationalError):
+                service.update_file("/test/a.txt", no_such_column=1)
+
+            service.update_file("/test/a.txt", size=2)
+            service.flush()
+            assert service.get_file("/test/a.txt")["size"] == 2
+            service.close()
+
+    def test_reads_use_read_only_pool(self):
+        """読み取りは読み取り専用接続で行い、コミット済みの書き込みが見える"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_readers.db"
+            service = IndexService(db_path)
+            service.init_db()
+
+            with service._reader() as conn:
+                with pytest.raises(sqlite3.OperationalError):
+                    conn.execute("DELETE FROM file_metadata")
+
+            service.register_path("/test")
+            assert [p["path"] for p in service.get_watch_paths()] == ["/test"]
+
+            # トランザクション内では未コミットの変更も読める
+            with service.transaction():
+                service.update_path_status("/test", "scanning")
+                assert service.get_watch_paths()[0]["status"] == "scanning"
+            service.close()
+
+    def test_ignore_pattern_cache_not_stale_after_commit(self):
+        """コミット前に別スレッドが読み込んでも、コミット後は新しいパターンが使われる"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_ignore_cache.db"
+            service = IndexService(db_path)
+            service.init_db()
+
+            seen = []
+            with service.transaction():
+                service.add_ignore_pattern("node_modules")
+                # 未コミットの間に別スレッド（読み取り専用接続）が読み込む
+                reader = threading.Thread(target=lambda: seen.append(service.get_ignore_patterns()))
+                reader.start()
+                reader.join()
+
+            assert seen == [[]]
+            assert service.get_ignore_patterns() == ["node_modules"]
+            assert service.is_ignored("/project/node_modules/lib")
+            service.close()
+
+    def test_writer_survives_connection_failure(self):
+        """接続の取得に失敗しても呼び出し元に例外が返り、書き込みスレッドは動き続ける"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_writer_failure.db"
+            service = IndexService(db_path)
+            service.init_db()
+
+            original = service._get_connection
+            failures = iter([sqlite3.OperationalError("connection failed")])
+
+            def flaky_connection():
+                error = next(failures, None)
+                if error is not None:
+                    raise error
+                return original()
+
+            with patch.object(service, "_get_connection", side_effect=flaky_connection):
+                # 修正前は呼び出し元が永久に待機するため、別スレッドで実行してタイムアウトを設ける
+                errors = []
+
+                def remove():
+                    try:
+                        service.remove_file("/test/a.txt")
+                    except Exception as e:
+                        errors.append(e)
+
+                caller = threading.Thread(target=remove, daemon=True)
+                caller.start()
+                caller.join(timeout=5)
+                assert not caller.is_alive(), "書き込みの呼び出し元が待機したまま"
+                assert len(errors) == 1 and "connection failed" in str(errors[0])
+
+                service.add_file(
+                    path="/test/a.txt",
+                    name="a.txt",
+                    parent_path="/test",
+                    file_type="file",
+                    extension=".txt",
+                    size=1,
+                    mtime=time.time(),
+                )
+
+            assert service._writer.is_alive()
+            assert service.get_file("/test/a.txt") is not None
+            service.close()
@@ -63,5 +63,64 @@ class TestIgnoreFeature(unittest.TestCase):
         # 部分一致の確認 (node_modulesが含まれるパス)
         self.assertTrue(self.service.is_ignored("/project/node_modules/lib"))
 
+    def test_is_ignored_reflects_pattern_changes(self):
+        """パターンの追加・削除後はキャッシュが破棄され判定に反映される"""
+        self.assertFalse(self.service.is_ignored("/path/to/build/out.o"))
+        version = self.service.get_ignore_patterns_version()
+
+        self.service.add_ignore_pattern("build")
+        self.assertGreater(self.service.get_ignore_patterns_version(), version)
+        self.assertTrue(self.service.is_ignored("/path/to/build/out.o"))
+
+        # セパレータを含むパターンはフルパスに対してのみ照合する
+        self.service.add_ignore_pattern("/path/*/keep/*")
+        self.assertTrue(self.service.is_ignored("/path/to/keep/a.txt"))
+        self.assertFalse(self.service.is_ignored("/other/keep/a.txt"))
+
+        self.service.remove_ignore_pattern("build")
+        self.assertFalse(self.service.is_ignored("/path/to/build/out.o"))
+
+    def test_name_pattern_does_not_cross_separators(self):
+        """名前単体のパターンはパスの1要素の中だけで照合される"""
+        self.service.add_ignore_pattern("a*b")
+        self.service.add_ignore_pattern("te?t")
+
+        self.assertTrue(self.service.is_ignored("/path/axxb/file.txt"))
+        self.assertTrue(self.service.is_ignored("/path/test"))
+        self.assertFalse(self.service.is_ignored("/path/a/x/b"))
+        self.assertFalse(self.service.is_ignored("/path/te/t"))
+
+    def test_negated_class_starting_with_bracket(self):
+        """[!]...] は「] 以外の1文字」としてfnmatchと同様に照合される"""
+        self.service.add_ignore_pattern("[!]]x")
+
+        self.assertTrue(self.service.is_ignored("/p/ax"))
+        self.assertFalse(self.service.is_ignored("/p/]x"))
+
+    def test_empty_pattern_is_ignored(self):
+        """空文字列のパターンはどのパスにも一致しない"""
+        self.service.add_ignore_pattern("")
+        self.assertFalse(self.service.is_ignored("/project/src/main.py"))
+
+        self.service.add_ignore_pattern("node_modules")
+        self.assertTrue(self.service.is_ignored("/project/node_modules/lib"))
+        self.assertFalse(self.service.is_ignored("/project/src/main.py"))
+
+    def test_watcher_reloads_patterns_on_version_change(self):
+        """監視ハンドラーはパターンのバージョンが変わったときに判定関数を取得し直す"""
+        from backend.app.services.watcher import IndexEventHandler
+
+        handler = IndexEventHandler(self.service)
+        try:
+            self.assertFalse(handler._should_ignore("/project/dist/app.js"))
+
+            self.service.add_ignore_pattern("dist")
+            self.assertTrue(handler._should_ignore("/project/dist/app.js"))
+
+            self.service.remove_ignore_pattern("dist")
+            self.assertFalse(handler._should_ignore("/project/dist/app.js"))
+        finally:
+            handler.stop()
+
 if __name__ == "__main__":
     unittest.main()
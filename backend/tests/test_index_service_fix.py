@@ -1,6 +1,7 @@
 """
 統計情報更新エラーの再現テスト
 """
+import os
 import tempfile
 from pathlib import Path
 import pytest
@@ -34,3 +35,143 @@ class TestIndexServiceFix:
             except Exception as e:
                  # その他のエラーも含めて失敗とみなす
                  pytest.fail(f"An unexpected error occurred: {e}")
+
+    def test_set_path_error(self):
+        """set_path_errorでステータスとエラーメッセージが同時に更新される"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_fix.db"
+            service = IndexService(db_path)
+            service.init_db()
+            service.register_path("/test/path")
+
+            service.set_path_error("/test/path", "scan failed")
+
+            paths = service.get_watch_paths()
+            assert paths[0]["status"] == "error"
+            assert paths[0]["error_message"] == "scan failed"
+            service.close()
+
+    def test_migrate_legacy_bigram_table(self):
+        """旧形式のbigramテーブルは作り直され、2文字検索が引き続き動作する"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_fix.db"
+            conn = sqlite3.connect(db_path)
+            conn.execute(
+                "CREATE TABLE file_name_bigrams (file_id INTEGER NOT NULL, bigram TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX idx_file_name_bigrams_bigram ON file_name_bigrams(bigram)")
+            conn.commit()
+            conn.close()
+
+            service = IndexService(db_path)
+            service.init_db()
+            service.batch_add_files(
+                [
+                    {
+                        "path": "/test/readme.md",
+                        "name": "readme.md",
+                        "parent_path": "/test",
+                        "file_type": "file",
+                        "extension": ".md",
+                        "size": 1,
+                        "mtime": 0.0,
+                    }
+                ]
+            )
+            service.ensure_bigram_index_populated()
+
+            assert [r["name"] for r in service.search("me")] == ["readme.md"]
+            with service._reader() as reader:
+                assert reader.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'idx_file_name_bigrams_bigram'"
+                ).fetchone() is None
+            service.close()
+
+    def test_covering_watch_path(self):
+        """監視パス自身・配下のパスは最も深い監視パスにカバーされ、削除後はカバーされない"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir).resolve()
+            service = IndexService(root / "test_fix.db")
+            service.init_db()
+            outer = str(root / "watch")
+            inner = str(root / "watch" / "inner")
+            service.register_path(outer)
+            service.register_path(inner)
+
+            assert service.get_covering_watch_path(outer) == outer
+            assert service.get_covering_watch_path(inner + "/a/b.txt") == inner
+            assert service.get_covering_watch_path(outer + "/x.txt") == outer
+            assert service.get_covering_watch_path(str(root / "watcher")) is None
+
+            service.remove_path(inner)
+            assert service.get_covering_watch_path(inner + "/a/b.txt") == outer
+            service.close()
+
+    @pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="シンボリックリンクが必要")
+    def test_covering_watch_path_through_symlink(self):
+        """シンボリックリンク経由のパスも実体の監視パスにカバーされる"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir).resolve()
+            (root / "real").mkdir()
+            (root / "link").symlink_to(root / "real")
+            service = IndexService(root / "test_fix.db")
+            service.init_db()
+            service.register_path(str(root / "real"))
+
+            assert service.get_covering_watch_path(str(root / "link" / "a.txt")) == str(root / "real")
+            service.close()
+
+    def test_maintenance(self):
+        """メンテナンス後もデータが保持され、WALが切り詰められる"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_fix.db"
+            service = IndexService(db_path)
+            service.init_db()
+            service.register_path("/test/path")
+
+            service.maintenance()
+
+            wal_path = Path(str(db_path) + "-wal")
+            assert not wal_path.exists() or wal_path.stat().st_size == 0
+            assert [p["path"] for p in service.get_watch_paths()] == ["/test/path"]
+            service.close()
+
+    def test_maintenance_skipped_during_bulk_ingest(self):
+        """大量取り込み中のメンテナンスはチェックポイントを行わない"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_fix.db"
+            service = IndexService(db_path)
+            service.init_db()
+
+            service.begin_bulk_ingest()
+            service.register_path("/test/path")
+            wal_path = Path(str(db_path) + "-wal")
+            wal_size = wal_path.stat().st_size
+            assert wal_size > 0
+            service.maintenance()
+            assert wal_path.stat().st_size == wal_size
+            service.end_bulk_ingest()
+
+            service.maintenance()
+            assert wal_path.stat().st_size == 0
+            service.close()
+
+    def test_batch_remove_files(self):
+        """batch_remove_filesは指定したパスだけを削除する"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test_fix.db"
+            service = IndexService(db_path)
+            service.init_db()
+            service.batch_add_files([
+                {"path": f"/r/{n}", "name": n, "parent_path": "/r", "file_type": "file",
+                 "extension": ".txt", "size": 1, "mtime": 0.0}
+                for n in ("a.txt", "b.txt", "c.txt")
+            ])
+
+            service.batch_remove_files(["/r/a.txt", "/r/c.txt", "/r/missing.txt"])
+            service.batch_remove_files([])
+
+            assert service.get_file("/r/b.txt") is not None
+            assert service.get_file("/r/a.txt") is None
+            assert service.get_file_count() == 1
+            service.close()
@@ -0,0 +1,190 @@
+"""
+並列スキャナーテスト
+除外パターン判定とスキャン結果の確認
+"""
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.services.scanner import ParallelScanner, _take_full_batches
+
+
+class TestShouldIgnore:
+    """除外パターン判定テスト"""
+
+    def test_literal_and_glob_patterns(self):
+        """完全一致・ワイルドカード・部分一致で除外される"""
+        scanner = ParallelScanner(ignore_patterns=["node_modules", "*.pyc", ".git", ""])
+
+        assert scanner._should_ignore(Path("/project/node_modules"))
+        assert scanner._should_ignore(Path("/project/src/cache.pyc"))
+        assert scanner._should_ignore(Path("/project/.git"))
+        assert scanner._should_ignore(Path("/project/.github/node_modules_backup"))
+
+        assert not scanner._should_ignore(Path("/project/src/main.py"))
+        assert not scanner._should_ignore(Path("/project/src/app.pyc.txt"))
+
+    def test_patterns_are_partitioned(self):
+        """ワイルドカードの有無でパターンを分類し、部分一致はワイルドカード無しのみ対象とする"""
+        scanner = ParallelScanner(ignore_patterns=["build", "*.log", "tmp?"])
+
+        assert scanner._ignore_literals == frozenset({"build"})
+        assert scanner._ignore_substrings == ("build",)
+        assert scanner._should_ignore(Path("/project/tmp1"))
+        assert scanner._should_ignore(Path("/project/rebuild_notes.txt"))
+        assert not scanner._should_ignore(Path("/project/*.log.d/readme"))
+
+    def test_glob_decision_is_cached_per_name(self):
+        """同じ名前のワイルドカード判定はキャッシュから返される"""
+        scanner = ParallelScanner(ignore_patterns=["*.pyc"])
+
+        assert scanner._should_ignore(Path("/a/mod.pyc"))
+        assert scanner._should_ignore(Path("/b/mod.pyc"))
+        assert not scanner._should_ignore(Path("/b/mod.py"))
+
+        info = scanner._ignore_name_glob.cache_info()
+        assert (info.hits, info.misses) == (1, 2)
+
+    def test_no_patterns(self):
+        """パターンが空の場合は何も除外しない"""
+        scanner = ParallelScanner(ignore_patterns=[])
+        assert not scanner._should_ignore(Path("/project/anything"))
+
+
+class TestScanDirectory:
+    """ディレクトリスキャンテスト"""
+
+    def test_scan_directory_skips_ignored(self):
+        """除外対象を除いた全エントリを取得する"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src" / "pkg").mkdir(parents=True)
+            (root / "node_modules" / "lib").mkdir(parents=True)
+            (root / "README.md").write_text("readme")
+            (root / "src" / "main.py").write_text("print()")
+            (root / "src" / "pkg" / "mod.pyc").write_text("")
+            (root / "node_modules" / "lib" / "index.js").write_text("")
+
+            scanner = ParallelScanner(max_workers=2, ignore_patterns=["node_modules", "*.pyc"])
+            results = scanner.scan_directory(root)
+
+            names = sorted(f.name for f in results)
+            assert names == ["README.md", "main.py", "pkg", "src"]
+
+            readme = next(f for f in results if f.name == "README.md")
+            assert readme.file_type == "file"
+            assert readme.extension == ".md"
+            assert readme.size == len("readme")
+            assert readme.parent_path == str(root)
+
+    @pytest.mark.skipif(os.name == "nt", reason="シンボリックリンクが必要")
+    def test_scan_directory_does_not_follow_symlinks(self):
+        """ディレクトリへのシンボリックリンクは辿らない（ループ防止）"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "sub").mkdir()
+            (root / "sub" / "a.txt").write_text("a")
+            (root / "sub" / "loop").symlink_to(root)
+
+            scanner = ParallelScanner(max_workers=2)
+            results = scanner.scan_directory(root)
+
+            names = sorted(f.name for f in results)
+            assert names == ["a.txt", "loop", "sub"]
+
+    def test_scan_directory_splits_deep_trees(self):
+        """1タスクの上限を超える深いツリーも全て走査し、ルート直下もバッチに含める"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            deep = root
+            for i in range(100):
+                deep = deep / f"d{i}"
+            deep.mkdir(parents=True)
+            (deep / "leaf.txt").write_text("x")
+            (root / "top.txt").write_text("x")
+
+            batches = []
+            scanner = ParallelScanner(max_workers=2, batch_size=10)
+            results = scanner.scan_directory(root, on_batch=batches.append)
+
+            assert len(results) == 102
+            batched = [f.name for b in batches for f in b]
+            assert sorted(batched) == sorted(f.name for f in results)
+            assert "top.txt" in batched and "leaf.txt" in batched
+
+    def test_scan_directory_stream_returns_count(self):
+        """ストリーミング版は結果を保持せず件数を返す"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "sub").mkdir()
+            (root / "sub" / "a.txt").write_text("a")
+            (root / "b.txt").write_text("b")
+
+            batches = []
+            scanner = ParallelScanner(max_workers=2)
+            count = scanner.scan_directory_stream(root, on_batch=batches.append)
+
+            assert count == 3
+            assert sorted(f.name for b in batches for f in b) == ["a.txt", "b.txt", "sub"]
+
+    def test_scan_directory_stream_batches_in_workers(self):
+        """batch_in_workers=Trueではワーカースレッドから全件がバッチで渡る"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            for i in range(5):
+                (root / f"dir{i}").mkdir()
+                for j in range(7):
+                    (root / f"dir{i}" / f"f{j}.txt").write_text("x")
+
+            names = []
+            threads = set()
+            lock = threading.Lock()
+
+            def on_batch(batch):
+                with lock:
+                    names.extend(f.name for f in batch)
+                    threads.add(threading.get_ident())
+
+            scanner = ParallelScanner(max_workers=2, batch_size=4)
+            count = scanner.scan_directory_stream(
+                root, on_batch=on_batch, batch_in_workers=True
+            )
+
+            assert count == 40
+            assert len(names) == 40
+            # 40件はバッチサイズで割り切れるため、全バッチがワーカーから書き出される
+            assert threading.get_ident() not in threads
+
+    def test_scan_directory_with_process_pool(self):
+        """プロセスプールでもスレッドと同じ結果になり、除外パターンが適用される"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src" / "pkg").mkdir(parents=True)
+            (root / "src" / "pkg" / "mod.py").write_text("")
+            (root / "src" / "pkg" / "mod.pyc").write_text("")
+            (root / "README.md").write_text("readme")
+
+            batches = []
+            scanner = ParallelScanner(max_workers=2, ignore_patterns=["*.pyc"], use_processes=True)
+            count = scanner.scan_directory_stream(
+                root, on_batch=batches.append, batch_in_workers=True
+            )
+
+            names = sorted(f.name for b in batches for f in b)
+            assert count == 4
+            assert names == ["README.md", "mod.py", "pkg", "src"]
+
+
+class TestTakeFullBatches:
+    """バッチ切り出しテスト"""
+
+    def test_takes_full_batches_and_keeps_remainder(self):
+        """満杯のバッチだけを順に切り出し、端数は元のリストに残す"""
+        batch = list(range(10))
+        assert _take_full_batches(batch, 4) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+        assert batch == [8, 9]
+        assert _take_full_batches(batch, 4) == []
+        assert batch == [8, 9]
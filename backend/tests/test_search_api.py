@@ -91,6 +91,15 @@ class TestSearchAPI:
         response = client.get("/?json=1&file_type=directory")
         assert response.status_code == 200
 
+    def test_result_columns(self):
+        """列フラグに応じたJSON出力列が構築される"""
+        from app.routers.search import _result_columns
+
+        assert [k for k, _ in _result_columns(True, True, True)] == [
+            "name", "path", "type", "size", "date_modified"
+        ]
+        assert [k for k, _ in _result_columns(False, False, False)] == ["name", "type"]
+
 
 class TestStatusAPI:
     """ステータスAPIテスト"""
@@ -196,6 +205,24 @@ class TestIndexService:
         result = temp_index_service.get_file("/test/remove/file.txt")
         assert result is None
 
+    def test_remove_path_keeps_sibling_prefix(self, temp_index_service):
+        """パスの削除は名前が前方一致するだけの兄弟ディレクトリに影響しない"""
+        for path in ["/test/remove/file.txt", "/test/remove2/file.txt"]:
+            temp_index_service.add_file(
+                path=path,
+                name="file.txt",
+                parent_path=str(Path(path).parent),
+                file_type="file",
+                extension=".txt",
+                size=100,
+                mtime=1234567890.0,
+            )
+
+        temp_index_service.remove_path("/test/remove")
+
+        assert temp_index_service.get_file("/test/remove/file.txt") is None
+        assert temp_index_service.get_file("/test/remove2/file.txt") is not None
+
     def test_get_status(self, temp_index_service):
         """ステータス取得"""
         status = temp_index_service.get_status()
@@ -203,3 +230,95 @@ class TestIndexService:
         assert "paths" in status
         assert "total_files" in status
         assert "indexed_files" in status
+
+    def test_transaction_commits_grouped_writes(self, temp_index_service):
+        """transaction()内の書き込みがまとめてコミットされる"""
+        with temp_index_service.transaction():
+            temp_index_service.register_path("/test/tx")
+            temp_index_service.update_path_status("/test/tx", "scanning")
+
+        paths = temp_index_service.get_watch_paths()
+        assert any(p["path"] == "/test/tx" and p["status"] == "scanning" for p in paths)
+
+    def test_transaction_rollback_on_error(self, temp_index_service):
+        """transaction()内で例外が発生した場合はロールバックされる"""
+        with pytest.raises(RuntimeError):
+            with temp_index_service.transaction():
+                temp_index_service.register_path("/test/rollback")
+                raise RuntimeError("boom")
+
+        paths = temp_index_service.get_watch_paths()
+        assert not any(p["path"] == "/test/rollback" for p in paths)
+
+    def test_bulk_ingest_rebuilds_fts(self, temp_index_service):
+        """bulk_ingest()終了時にFTS5索引が再構築され、トリガーも復元される"""
+        file_data = {
+            "parent_path": "/test",
+            "file_type": "file",
+            "extension": ".txt",
+            "size": 100,
+            "mtime": 1234567890.0,
+        }
+        with temp_index_service.bulk_ingest():
+            temp_index_service.batch_add_files(
+                [{**file_data, "path": "/test/bulk.txt", "name": "bulk.txt"}]
+            )
+
+        assert [r["name"] for r in temp_index_service.search(query="bulk")] == ["bulk.txt"]
+
+        # トリガー復元後の通常の書き込みも索引に反映される
+        temp_index_service.add_file(path="/test/after.txt", name="after.txt", **file_data)
+        assert [r["name"] for r in temp_index_service.search(query="after")] == ["after.txt"]
+
+        # 削除していた二次インデックスも作り直される
+        with temp_index_service._reader() as conn:
+            indexes = {
+                row[0]
+                for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            }
+        assert "idx_file_metadata_name" in indexes
+
+    def test_search_query_with_quotes(self, temp_index_service):
+        """ダブルクォートを含むクエリでもFTS5の構文エラーにならない"""
+        temp_index_service.add_file(
+            path='/test/say "hi" now.txt',
+            name='say "hi" now.txt',
+            parent_path="/test",
+            file_type="file",
+            extension=".txt",
+            size=100,
+            mtime=1234567890.0,
+        )
+
+        results = temp_index_service.search(query='"hi" n')
+        assert [r["name"] for r in results] == ['say "hi" now.txt']
+
+    def test_search_depth_filter(self, temp_index_service):
+        """depth指定時は基準パスからの階層がdepth以内のものだけを返す"""
+        base = str(Path("/test/depth"))
+        for rel in ["a.txt", "sub/b.txt", "sub/deep/c.txt"]:
+            path = Path(base) / rel
+            temp_index_service.add_file(
+                path=str(path),
+                name=path.name,
+                parent_path=str(path.parent),
+                file_type="file",
+                extension=".txt",
+                size=100,
+                mtime=1234567890.0,
+            )
+        temp_index_service.add_file(
+            path=str(Path("/test/depth2/d.txt")),
+            name="d.txt",
+            parent_path=str(Path("/test/depth2")),
+            file_type="file",
+            extension=".txt",
+            size=100,
+            mtime=1234567890.0,
+        )
+
+        results = temp_index_service.search(path_filter=base, depth=2, sort="name")
+        assert [r["name"] for r in results] == ["a.txt", "b.txt"]
+
+        results = temp_index_service.search(path_filter=base, depth=2, sort="name", offset=1)
+        assert [r["name"] for r in results] == ["b.txt"]
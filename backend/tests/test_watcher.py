@@ -0,0 +1,81 @@
+"""
+ファイル監視ハンドラーテスト
+デバウンス期間内のイベント集約とインデックスへの反映の確認
+"""
+import asyncio
+import tempfile
+from pathlib import Path
+
+from watchdog.events import FileMovedEvent
+
+from app.services.index_service import IndexService
+from app.services.watcher import IndexEventHandler
+
+
+class TestEventCollapse:
+    """イベント集約テスト"""
+
+    def test_created_modified_collapse_and_delete_wins(self):
+        """created/modifiedは1件に集約され、期間内の作成→削除は破棄される"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            service = IndexService(root / "test.db")
+            service.init_db()
+            # 自動処理されないよう十分長いデバウンス間隔にする
+            handler = IndexEventHandler(service, debounce_ms=60_000)
+            try:
+                kept = root / "kept.txt"
+                kept.write_text("x")
+                handler._queue_event("created", str(kept))
+                handler._queue_event("modified", str(kept))
+
+                # 作成後に削除された一時ファイル
+                handler._queue_event("created", str(root / "tmp.swp"))
+                handler._queue_event("deleted", str(root / "tmp.swp"))
+
+                # 既にインデックスにあるファイルの更新→削除は削除になる
+                service.batch_add_files([{
+                    "path": str(root / "old.txt"), "name": "old.txt", "parent_path": str(root),
+                    "file_type": "file", "extension": ".txt", "size": 1, "mtime": 0.0,
+                }])
+                handler._queue_event("modified", str(root / "old.txt"))
+                handler._queue_event("deleted", str(root / "old.txt"))
+
+                pending = handler._pending_events
+                assert set(pending) == {str(kept), str(root / "old.txt")}
+                assert pending[str(kept)][0] == "upsert"
+                assert pending[str(root / "old.txt")][0] == "deleted"
+
+                asyncio.run(handler.flush())
+
+                assert service.get_file(str(kept)) is not None
+                assert service.get_file(str(root / "old.txt")) is None
+                assert service.get_file(str(root / "tmp.swp")) is None
+            finally:
+                handler.stop()
+                service.close()
+
+    def test_delete_after_move_over_indexed_file_is_applied(self):
+        """インデックス済みファイルへの移動（上書き）後の削除はインデックスから削除する"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            service = IndexService(root / "test.db")
+            service.init_db()
+            handler = IndexEventHandler(service, debounce_ms=60_000)
+            try:
+                existing = str(root / "existing.txt")
+                service.batch_add_files([{
+                    "path": existing, "name": "existing.txt", "parent_path": str(root),
+                    "file_type": "file", "extension": ".txt", "size": 1, "mtime": 0.0,
+                }])
+
+                # mv tmp existing.txt; rm existing.txt
+                handler.on_moved(FileMovedEvent(str(root / "tmp"), existing))
+                handler._queue_event("deleted", existing)
+
+                asyncio.run(handler.flush())
+
+                assert service.get_file(existing) is None
+            finally:
+                handler.stop()
+                service.close()